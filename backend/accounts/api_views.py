@@ -6,6 +6,8 @@ from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 
+from .token_auth import token_from_request, user_for_token, forget_token
+
 User = get_user_model()
 
 
@@ -145,28 +147,24 @@ def api_login(request):
 @csrf_exempt
 def api_logout(request):
     # Delete token so it can't be used again
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Token '):
-        token_key = auth_header.split(' ')[1]
+    token_key = token_from_request(request)
+    if token_key:
         try:
             Token.objects.filter(key=token_key).delete()
         except Exception:
             pass
+        forget_token(token_key)
     return JsonResponse({'success': True})
 
 
 @csrf_exempt
 def api_check_auth(request):
-    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth_header.startswith('Token '):
-        token_key = auth_header.split(' ')[1]
-        try:
-            token = Token.objects.get(key=token_key)
-            return JsonResponse({
-                'authenticated': True,
-                'user_id':  token.user.id,
-                'username': token.user.username,
-            })
-        except Token.DoesNotExist:
-            pass
+    token_key = token_from_request(request)
+    user = user_for_token(token_key) if token_key else None
+    if user:
+        return JsonResponse({
+            'authenticated': True,
+            'user_id':  user.id,
+            'username': user.username,
+        })
     return JsonResponse({'authenticated': False}, status=401)
\ No newline at end of file
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'accounts'
+
+    def ready(self):
+        # Registers the signal handlers that keep cached tokens fresh
+        from . import token_auth  # noqa: F401
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from . import token_auth
+
+
+class TokenAuthTests(TestCase):
+
+    def setUp(self):
+        token_auth.clear_token_cache()
+        self.addCleanup(token_auth.clear_token_cache)
+        self.user = get_user_model().objects.create_user(
+            username='player', email='player@example.com',
+            password='pw123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def check(self):
+        return self.client.get(
+            '/accounts/api/check/',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def test_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            user = token_auth.user_for_token(self.token.key)
+            self.assertEqual(user.username, 'player')
+        with self.assertNumQueries(0):
+            self.assertEqual(token_auth.user_for_token(self.token.key), user)
+        self.assertIsNone(token_auth.user_for_token('not-a-token'))
+
+    def test_callers_get_their_own_copy(self):
+        user = token_auth.user_for_token(self.token.key)
+        user.username = 'changed in memory'
+        self.assertEqual(
+            token_auth.user_for_token(self.token.key).username, 'player'
+        )
+
+    def test_logout_invalidates(self):
+        self.assertEqual(self.check().status_code, 200)
+        self.client.post(
+            '/accounts/api/logout/',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(self.check().status_code, 401)
+
+    def test_user_change_invalidates(self):
+        token_auth.user_for_token(self.token.key)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.check().json()['username'], 'renamed')
+
+    def logout_during_lookup(self):
+        """
+        Look the token up while a logout lands between its load and
+        store, then look it up again. Returns the second result.
+        """
+        key, load = self.token.key, token_auth._load
+
+        def load_then_logout(key):
+            user = load(key)
+            Token.objects.filter(key=key).delete()
+            return user
+
+        with mock.patch.object(token_auth, '_load', load_then_logout):
+            token_auth.user_for_token(key)
+        return token_auth.user_for_token(key)
+
+    def test_logout_during_lookup_is_not_cached(self):
+        self.assertIsNone(self.logout_during_lookup())
+
+    @override_settings(TOKEN_AUTH_CACHE={'TTL_S': 0})
+    def test_expired_entries_are_looked_up_again(self):
+        token_auth.user_for_token(self.token.key)
+        with self.assertNumQueries(1):
+            token_auth.user_for_token(self.token.key)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SIZE': 1})
+    def test_least_recently_used_is_evicted(self):
+        other = Token.objects.create(user=get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='pw123456'
+        ))
+        token_auth.user_for_token(self.token.key)
+        token_auth.user_for_token(other.key)
+        with self.assertNumQueries(1):
+            token_auth.user_for_token(self.token.key)
+
+    @override_settings(
+        CACHES={'auth': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-auth-tests',
+        }},
+        TOKEN_AUTH_CACHE={'ALIAS': 'auth'},
+    )
+    def test_shared_cache_backend(self):
+        token_auth.user_for_token(self.token.key)
+        # Another process starts with an empty local cache
+        token_auth.clear_token_cache()
+        with self.assertNumQueries(0):
+            user = token_auth.user_for_token(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(
+            token_auth.user_for_token(self.token.key).username, 'renamed'
+        )
+
+        # A logout is seen at once, with no local copy left to expire
+        self.assertEqual(self.check().status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.check().status_code, 401)
+
+    @override_settings(
+        CACHES={'auth': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-auth-race',
+        }},
+        TOKEN_AUTH_CACHE={'ALIAS': 'auth'},
+    )
+    def test_logout_during_shared_lookup_is_not_cached(self):
+        self.assertIsNone(self.logout_during_lookup())
+
+    def test_user_save_only_drops_that_users_tokens(self):
+        other = Token.objects.create(user=get_user_model().objects.create_user(
+            username='other', email='other@example.com', password='pw123456'
+        ))
+        token_auth.user_for_token(self.token.key)
+        token_auth.user_for_token(other.key)
+        self.user.save()
+        with self.assertNumQueries(0):
+            token_auth.user_for_token(other.key)
+        with self.assertNumQueries(1):
+            token_auth.user_for_token(self.token.key)
@@ -0,0 +1,180 @@
+"""
+Token → user lookups for the JSON API.
+
+Each API call sends `Authorization: Token <key>`. Looking that up is
+one query (token joined to its user), and the user is then cached per
+token for settings.TOKEN_AUTH_CACHE['TTL_S'] seconds.
+
+With 'ALIAS' unset the users are kept in this process, in an LRU of
+'SIZE' tokens (chess_project/lru.py). Deleting a token (api_logout,
+the admin) or saving its user drops the entry in the process that did
+it, but other processes keep serving their copy until it expires —
+up to TTL_S after a logout. Deployments with more than one web
+process should set 'ALIAS' to one of settings.CACHES: the users are
+then cached there only, so a logout or a user change anywhere is seen
+by every process at once.
+
+A lookup that races a logout must not cache the user it loaded just
+before the token went. Locally every forget bumps `_forgets`, and a
+lookup only stores its result if no forget happened while it ran. In
+the shared cache each token has a generation counter that forgetting
+increments; entries carry the generation they were loaded under and
+are ignored once it moves on.
+"""
+
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from chess_project.lru import LRUCache, django_cache
+
+
+DEFAULTS = {
+    'SIZE':  10000,
+    'TTL_S': 300,
+    'ALIAS': None,
+}
+
+
+def auth_setting(name):
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _unindex(key, entry):
+    """Remove `key` from the user index. Call with _local.lock held."""
+    keys = _by_user.get(entry[1].pk)
+    keys.discard(key)
+    if not keys:
+        del _by_user[entry[1].pk]
+
+
+_local   = LRUCache(lambda: auth_setting('SIZE'), on_evict=_unindex)
+_by_user = {}              # user pk → token keys in _local
+_forgets = 0               # bumped by every forget_token()
+
+
+def _shared():
+    return django_cache(auth_setting('ALIAS'))
+
+
+def _cache_key(key):
+    return f'auth:token:{key}'
+
+
+def _generation_key(key):
+    return f'auth:token-gen:{key}'
+
+
+def clear_token_cache():
+    """Forget every user cached by this process; ALIAS is not touched."""
+    global _forgets
+    with _local.lock:
+        _forgets += 1
+        _local.clear()
+        _by_user.clear()
+
+
+def _drop_local(key):
+    """Remove `key` from _local and the index. Call with _local.lock held."""
+    found = _local.pop(key)
+    if found is not None:
+        _unindex(key, found)
+
+
+def _load(key):
+    try:
+        return Token.objects.select_related('user').get(key=key).user
+    except Token.DoesNotExist:
+        return None
+
+
+def user_for_token(key):
+    """The user the token `key` belongs to, or None."""
+    ttl = auth_setting('TTL_S')
+    shared = _shared()
+    if shared is not None:
+        found = shared.get_many([_cache_key(key), _generation_key(key)])
+        generation = found.get(_generation_key(key), 0)
+        entry = found.get(_cache_key(key))
+        if entry is not None and entry[0] == generation:
+            return copy.copy(entry[1])
+        user = _load(key)
+        if user is None:
+            return None     # not cached, so a new token works at once
+        shared.set(_cache_key(key), (generation, user), ttl)
+        return copy.copy(user)
+
+    now = time.monotonic()
+    with _local.lock:
+        found = _local.get(key)
+        if found is not None and found[0] > now:
+            return copy.copy(found[1])
+        forgets = _forgets
+
+    user = _load(key)
+    if user is None:
+        return None
+
+    with _local.lock:
+        if _forgets != forgets:
+            # Logged out (or changed) while we loaded: don't cache it
+            return copy.copy(user)
+        _drop_local(key)
+        _by_user.setdefault(user.pk, set()).add(key)
+        _local.put(key, (now + ttl, user))
+    # Callers get their own copy, so changes to it never leak into the
+    # cached user
+    return copy.copy(user)
+
+
+def token_from_request(request):
+    """The key from an `Authorization: Token <key>` header, or None."""
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if auth.startswith('Token '):
+        return auth.split(' ')[1]
+    return None
+
+
+def user_from_request(request):
+    """The user authenticated by the request's token, or None."""
+    key = token_from_request(request)
+    return user_for_token(key) if key else None
+
+
+def forget_token(key):
+    """Drop the cached user of one token."""
+    global _forgets
+    with _local.lock:
+        _forgets += 1
+        _drop_local(key)
+    shared = _shared()
+    if shared is not None:
+        try:
+            shared.incr(_generation_key(key))
+        except ValueError:
+            # First forget; the counter outlives any entry cached before
+            shared.add(_generation_key(key), 1, auth_setting('TTL_S'))
+        shared.delete(_cache_key(key))
+
+
+@receiver(post_delete, sender=Token)
+def _token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def _user_saved(sender, instance, **kwargs):
+    with _local.lock:
+        stale = list(_by_user.get(instance.pk, ()))
+    for key in stale:
+        forget_token(key)
+    if _shared() is not None:
+        # Another process may have cached this user under its token
+        for key in Token.objects.filter(user=instance).values_list(
+                'key', flat=True):
+            forget_token(key)
@@ -0,0 +1,59 @@
+"""
+Least-recently-used caches kept in process memory.
+
+Used by the legal-move cache (game/move_cache.py) and the token → user
+cache (accounts/token_auth.py).
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+def django_cache(alias):
+    """The Django cache settings.CACHES[alias], or None if `alias` is unset."""
+    return caches[alias] if alias else None
+
+
+class LRUCache:
+    """
+    A map of at most size() entries that drops the least recently used
+    one when full, calling on_evict(key, value) for it. `lock` may be
+    held around several calls to make them one step.
+    """
+
+    def __init__(self, size, on_evict=None):
+        self.size     = size
+        self.on_evict = on_evict
+        self.lock     = threading.RLock()
+        self._data    = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """The value stored for `key`, which becomes the most recent."""
+        with self.lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            limit = self.size()
+            while len(self._data) > limit:
+                old_key, old_value = self._data.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(old_key, old_value)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self.lock:
+            self._data.clear()
@@ -139,6 +139,17 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # SQLite ignores select_for_update(); taking the write lock when
+        # a transaction starts is what serializes make_move instead
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Tests use a file as well: the in-memory test database fails on
+        # a lock instead of waiting, so concurrency tests couldn't run
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -318,4 +329,30 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
-}
\ No newline at end of file
+}
+
+# Token → user lookups of the JSON API (accounts/token_auth.py), kept
+# per process for TTL_S seconds, so a logout only reaches the other
+# processes when their copy expires. With more than one web process,
+# set ALIAS to a CACHES entry they all share.
+TOKEN_AUTH_CACHE = {
+    'SIZE':  10000,
+    'TTL_S': 300,
+    'ALIAS': None,
+}
+
+
+# ─────────────────────────────────────────
+# CHESS ENGINE (AI opponent)
+# ─────────────────────────────────────────
+# Only what differs from the defaults; every setting, its default and
+# what it does are listed in game/engine/config.py (DEFAULTS).
+CHESS_ENGINE = {
+    # Opening book (`python manage.py build_book games.pgn`). The AI
+    # plays book moves while it can; a missing file means no book.
+    'BOOK_PATH': BASE_DIR / 'engine_data' / 'book.bin',
+
+    # Endgame tablebases (`python manage.py build_tablebases`). With
+    # three pieces or fewer left, the AI plays perfectly from them.
+    'TABLEBASE_DIR': BASE_DIR / 'engine_data' / 'tablebases',
+}
@@ -0,0 +1,295 @@
+"""
+Running the AI's reply, in or out of the web request.
+
+CHESS_ENGINE['AI_MODE'] picks where the search runs:
+
+  'inline' — inside the web worker that handled the player's move
+  'pool'   — in a ProcessPoolExecutor; the view waits for the result,
+             but engine CPU is capped by AI_WORKERS, not web workers
+  'queue'  — as an EngineJob row picked up by `manage.py engine_worker`;
+             make_move answers 202 and the client polls /game/<id>/ai/
+
+All three modes finish the turn with finish_ai_reply(), so the response
+body is the same whichever one ran it.
+"""
+
+import json
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .move_cache import legal_moves, game_outcome
+from .engine import ai_move, difficulty_budget
+from .engine.config import engine_setting
+from .engine.pool import get_pool, shutdown_pool
+from .models import GameSession, EngineJob
+
+
+logger = logging.getLogger(__name__)
+
+# ─────────────────────────────────────────
+# COMPUTING THE MOVE
+# ─────────────────────────────────────────
+
+def compute_ai_move(board, difficulty):
+    """
+    Black's reply for `board` within the difficulty budget.
+    Uses the process pool in 'pool' mode, falling back to running
+    inline if the pool breaks.
+    """
+    moves = legal_moves(board, 'black')
+    if len(moves) <= 1:
+        # Nothing to search: no reply at all, or a forced one
+        return moves[0] if moves else None
+
+    budget = difficulty_budget(difficulty)
+    if engine_setting('AI_MODE') != 'pool':
+        return ai_move(board, **budget)
+
+    try:
+        return get_pool().submit(ai_move, board, **budget).result()
+    except BrokenProcessPool:
+        shutdown_pool()
+        return ai_move(board, **budget)
+
+
+def choose_ai_move(board, difficulty):
+    """
+    compute_ai_move(), falling back to black's first legal move if the
+    search raises. Black's turn is already saved when the search runs,
+    so a reply of some kind is what keeps the game playable.
+    """
+    try:
+        return compute_ai_move(board, difficulty)
+    except Exception:
+        logger.exception('AI search failed; playing a fallback move')
+        return fallback_move(board)
+
+
+def fallback_move(board):
+    """Black's first legal move, or None — a reply that needs no search."""
+    moves = legal_moves(board, 'black')
+    return moves[0] if moves else None
+
+
+# ─────────────────────────────────────────
+# FINISHING THE TURN
+# ─────────────────────────────────────────
+
+class GameChanged(Exception):
+    """The game moved on while the AI was thinking."""
+
+
+def play_ai_reply(game, board):
+    """
+    Search black's reply to `board` and store it on `game` (see
+    finish_ai_reply). The search holds no lock or transaction.
+    """
+    return finish_ai_reply(
+        game, board, choose_ai_move(board, game.difficulty)
+    )
+
+
+def resume_stalled_reply(game):
+    """
+    Answer a reply that nobody is working on any more, and return True
+    if this call did.
+
+    'inline' and 'pool' modes save black's turn before the search, with
+    no job row behind it, so a web process that died mid-search would
+    leave the game waiting for good. An active game that has been on
+    black's turn for AI_JOB_TIMEOUT_S with no queued job is claimed
+    (one caller wins) and its reply played here.
+    """
+    if game.status != 'active' or game.turn != 'black':
+        return False
+    if game.engine_jobs.filter(status__in=('pending', 'running')).exists():
+        return False
+
+    timeout = engine_setting('AI_JOB_TIMEOUT_S')
+    stale = timezone.now() - timedelta(seconds=timeout)
+    claimed = GameSession.objects.filter(
+        id=game.id, status='active', turn='black',
+        position_hash=game.position_hash, updated_at__lt=stale,
+    ).update(updated_at=timezone.now())
+    if not claimed:
+        return False
+    try:
+        play_ai_reply(game, game.get_board())
+    except GameChanged:
+        return False
+    return True
+
+
+def finish_ai_reply(game, board, ai_result):
+    """
+    Play `ai_result` on `board`, store the result on `game` and
+    return the JSON body for the client.
+
+    `game` must have been saved with black to move. Its row is locked
+    and checked first, and GameChanged is raised if it has moved on.
+    """
+    with transaction.atomic():
+        current = GameSession.objects.select_for_update().filter(
+            id=game.id
+        ).values_list('status', 'turn', 'position_hash').first()
+        if current != ('active', 'black', game.position_hash):
+            raise GameChanged('Game changed before the AI moved')
+        return _store_ai_reply(game, board, ai_result)
+
+
+def _store_ai_reply(game, board, ai_result):
+    ai_move_data = None
+    outcome      = 'ongoing'
+    game.turn    = 'white'
+
+    if ai_result:
+        ar, ac, br, bc = ai_result
+        ai_move_data   = {'from': [ar, ac], 'to': [br, bc]}
+        board          = game.record_move(board, ar, ac, br, bc)
+        outcome, _     = game_outcome(board, 'white')
+
+        if outcome == 'checkmate':
+            game.set_board(board)
+            game.status = 'black_won'
+            game.save()
+            return {
+                'board':   board,
+                'status':  'black_won',
+                'ai_move': ai_move_data,
+                'message': 'Checkmate! You lost! 😔'
+            }
+
+        draw = 'stalemate' if outcome == 'stalemate' else \
+            game.draw_reason(board)
+
+        if draw:
+            game.set_board(board)
+            game.status = 'draw'
+            game.save()
+            return {
+                'board':       board,
+                'status':      'draw',
+                'draw_reason': draw,
+                'ai_move':     ai_move_data,
+                'message':     "Draw! 🤝"
+            }
+
+    game.set_board(board)
+    game.save()
+
+    in_check = outcome == 'check'
+
+    return {
+        'board':    board,
+        'status':   'active',
+        'ai_move':  ai_move_data,
+        'in_check': in_check,
+        'message':  '⚠️ Check!' if in_check else 'Your turn'
+    }
+
+
+# ─────────────────────────────────────────
+# JOB QUEUE ('queue' mode)
+# ─────────────────────────────────────────
+
+def enqueue_ai_reply(game, board):
+    """
+    Save `board` with black to move and queue the AI's reply.
+    The game's turn stays 'black' until a worker finishes the job.
+    """
+    game.turn = 'black'
+    game.set_board(board)
+    game.save()
+    return EngineJob.objects.create(
+        game=game, position_hash=game.position_hash
+    )
+
+
+def claim_job():
+    """
+    Atomically take the oldest pending job, or one whose worker has
+    been silent for longer than AI_JOB_TIMEOUT_S, and count the
+    attempt. Returns None when there's nothing to do.
+    """
+    timeout = engine_setting('AI_JOB_TIMEOUT_S')
+    stale = timezone.now() - timedelta(seconds=timeout)
+    candidates = EngineJob.objects.filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=stale)
+    ).order_by('created_at').values_list('id', 'status')[:10]
+
+    for job_id, status in candidates:
+        claimed = EngineJob.objects.filter(id=job_id, status=status).update(
+            status='running', updated_at=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return EngineJob.objects.select_related('game').get(id=job_id)
+    return None
+
+
+def run_job(job):
+    """
+    Play the AI reply for a claimed job and record the outcome.
+
+    A search error still gets a reply (see choose_ai_move). Any other
+    error puts the job back to 'pending' for another try. Once
+    AI_JOB_ATTEMPTS tries are used up — failed, or lost with a worker
+    that died mid-search — black plays fallback_move() without a
+    search, so the game isn't left on black's turn for good.
+    """
+    game = job.game
+    last_try = job.attempts >= engine_setting('AI_JOB_ATTEMPTS')
+    try:
+        if game.status != 'active' or game.turn != 'black' or \
+           game.position_hash != job.position_hash:
+            raise GameChanged('Game changed before the AI moved')
+
+        board = game.get_board()
+        if job.attempts > engine_setting('AI_JOB_ATTEMPTS'):
+            ai_result = fallback_move(board)
+        else:
+            ai_result = choose_ai_move(board, game.difficulty)
+        _finish_job(job, game, board, ai_result)
+    except GameChanged as e:
+        job.status = 'failed'
+        job.result = json.dumps({'error': str(e)})
+        job.save()
+    except Exception as e:
+        logger.exception('Engine job #%s failed', job.id)
+        if not last_try:
+            job.status = 'pending'
+            job.result = json.dumps({'error': str(e)})
+            job.save()
+        else:
+            _fallback_job(job, e)
+    return job
+
+
+def _finish_job(job, game, board, ai_result):
+    # Store the reply and the job's result together
+    with transaction.atomic():
+        payload = finish_ai_reply(game, board, ai_result)
+        job.status = 'done'
+        job.result = json.dumps(payload)
+        job.save()
+
+
+def _fallback_job(job, error):
+    """
+    The last try failed: answer with fallback_move(), starting again
+    from the stored game rather than the half-updated one.
+    """
+    try:
+        game = GameSession.objects.get(id=job.game_id)
+        board = game.get_board()
+        _finish_job(job, game, board, fallback_move(board))
+    except Exception:
+        logger.exception('Engine job #%s: fallback reply failed', job.id)
+        job.status = 'failed'
+        job.result = json.dumps({'error': str(error)})
+        job.save()
@@ -0,0 +1,639 @@
+"""
+Bitboard position for the chess engine.
+
+The list-of-dicts board in chess_logic.py is what views and the JSON API
+speak. This module holds the same position as 12 integer bitboards so the
+AI and move validation can work on it without walking Python dicts.
+
+Squares are numbered row * 8 + col, using the same (row, col) layout as the
+dict board: row 0 is black's back rank, row 7 is white's.
+
+The rules match chess_logic.py exactly: no castling moves, no en passant
+captures, pawns always promote to a queen. Castling rights and the
+en-passant square are still tracked so positions round-trip faithfully.
+"""
+
+from .chess_logic import (
+    create_piece, ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING,
+    to_fen, parse_fen
+)
+from .piece_tables import MG_SQUARE, EG_SQUARE, PHASE_BY_INDEX
+
+
+WHITE, BLACK = 0, 1
+COLORS = ('white', 'black')
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_TYPES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+
+# Piece index used in the mailbox and in `bb`: color * 6 + type
+EMPTY = -1
+
+FULL = (1 << 64) - 1
+
+# Zobrist keys shared with chess_logic.zobrist_hash(), by piece index
+PIECE_KEYS = [
+    ZOBRIST_PIECES[(COLORS[idx // 6], PIECE_TYPES[idx % 6])]
+    for idx in range(12)
+]
+
+# Castling right bits (same layout as chess_logic.castling_rights())
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+
+# Squares that take castling rights away when a piece leaves or is captured
+CASTLING_SQUARES = {
+    60: CASTLE_WK | CASTLE_WQ,   # e1
+    63: CASTLE_WK,               # h1
+    56: CASTLE_WQ,               # a1
+    4:  CASTLE_BK | CASTLE_BQ,   # e8
+    7:  CASTLE_BK,               # h8
+    0:  CASTLE_BQ,               # a8
+}
+
+# Move encoding: from | to << 6 | flags
+MOVE_PROMOTION = 1 << 12
+
+
+def encode_move(frm, to, promotion=False):
+    return frm | (to << 6) | (MOVE_PROMOTION if promotion else 0)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+# ─────────────────────────────────────────
+# ATTACK TABLES (built once at import)
+# ─────────────────────────────────────────
+
+ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL   = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+DIRECTIONS = ORTHOGONAL + DIAGONAL
+
+
+def _build_step_table(steps):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for dr, dc in steps:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r * 8 + c)
+        table.append(mask)
+    return table
+
+
+def _build_rays():
+    rays = {}
+    for dr, dc in DIRECTIONS:
+        table = []
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            mask = 0
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                mask |= 1 << (r * 8 + c)
+                r += dr
+                c += dc
+            table.append(mask)
+        rays[(dr, dc)] = table
+    return rays
+
+
+KNIGHT_ATTACKS = _build_step_table(
+    [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+)
+KING_ATTACKS = _build_step_table(
+    [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+)
+# PAWN_ATTACKS[color][sq] — squares a pawn of `color` on `sq` attacks
+PAWN_ATTACKS = (
+    _build_step_table([(-1, -1), (-1, 1)]),
+    _build_step_table([(1, -1), (1, 1)]),
+)
+
+_RAYS = _build_rays()
+
+# (ray table, True if the ray runs towards higher square numbers)
+ORTHOGONAL_RAYS = tuple((_RAYS[d], d[0] * 8 + d[1] > 0) for d in ORTHOGONAL)
+DIAGONAL_RAYS   = tuple((_RAYS[d], d[0] * 8 + d[1] > 0) for d in DIAGONAL)
+
+
+def _build_between():
+    """BETWEEN[a][b] — squares strictly between two aligned squares."""
+    between = [[0] * 64 for _ in range(64)]
+    for dr, dc in DIRECTIONS:
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            path = 0
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                between[sq][r * 8 + c] = path
+                path |= 1 << (r * 8 + c)
+                r += dr
+                c += dc
+    return between
+
+
+BETWEEN = _build_between()
+
+
+def _slide(sq, occupied, rays):
+    """Sliding attacks from `sq`, each ray cut at the first blocker."""
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= table[first]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(sq, occupied):
+    return _slide(sq, occupied, DIAGONAL_RAYS)
+
+
+def rook_attacks(sq, occupied):
+    return _slide(sq, occupied, ORTHOGONAL_RAYS)
+
+
+def square_name(sq):
+    """Square number → algebraic name, e.g. 52 → 'e2'."""
+    return 'abcdefgh'[sq & 7] + str(8 - (sq >> 3))
+
+
+def parse_square(name):
+    """Algebraic name → square number, e.g. 'e2' → 52."""
+    return (8 - int(name[1])) * 8 + 'abcdefgh'.index(name[0])
+
+
+def move_name(move):
+    """Move → coordinate notation, e.g. 'e2e4' or 'a7a8q'."""
+    name = square_name(move & 63) + square_name((move >> 6) & 63)
+    return name + 'q' if move & MOVE_PROMOTION else name
+
+
+def iter_bits(mask):
+    """Yield square numbers of every set bit."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# ─────────────────────────────────────────
+# POSITION
+# ─────────────────────────────────────────
+
+class Position:
+    """
+    A chess position stored as bitboards.
+
+    bb[color * 6 + type]  — one bitboard per piece kind
+    occ[color]            — all pieces of a color
+    mailbox[sq]           — piece index on a square, or EMPTY
+    moved                 — squares whose piece has `has_moved` set
+    hash                  — Zobrist key, kept up to date by push()/pop()
+    mg, eg                — white-positive middlegame / endgame
+                            material + piece-square totals
+    phase                 — game phase (see piece_tables.py)
+
+    The evaluation totals are updated piece by piece in _put()/_remove(),
+    so push() and pop() keep them current for free.
+    """
+
+    __slots__ = (
+        'bb', 'occ', 'mailbox', 'side', 'castling', 'ep_square',
+        'moved', 'king_sq', 'hash', 'mg', 'eg', 'phase', '_stack',
+    )
+
+    def __init__(self):
+        self.bb        = [0] * 12
+        self.occ       = [0, 0]
+        self.mailbox   = [EMPTY] * 64
+        self.side      = WHITE
+        self.castling  = 0
+        self.ep_square = None
+        self.moved     = 0
+        self.king_sq   = [-1, -1]
+        self.hash      = 0
+        self.mg        = 0
+        self.eg        = 0
+        self.phase     = 0
+        self._stack    = []
+
+    # ── Conversion ──────────────────────────
+
+    @classmethod
+    def from_board(cls, board, turn='white'):
+        """Build a Position from the list-of-dicts board."""
+        pos = cls()
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece:
+                    sq = r * 8 + c
+                    idx = COLORS.index(piece['color']) * 6 + \
+                        PIECE_TYPES.index(piece['type'])
+                    pos._put(idx, sq)
+                    if piece.get('has_moved'):
+                        pos.moved |= 1 << sq
+        pos.side = COLORS.index(turn)
+        pos.castling = pos._castling_from_placement()
+        pos.hash = pos.compute_hash()
+        return pos
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Build a Position from a FEN string (parsed by
+        chess_logic.parse_fen). Raises ValueError if it can't be parsed.
+        """
+        board, turn, en_passant, _, _ = parse_fen(fen)
+        pos = cls.from_board(board, turn)
+        if en_passant:
+            pos.ep_square = en_passant[0] * 8 + en_passant[1]
+        return pos
+
+    def to_fen(self, halfmove=0, fullmove=1):
+        """FEN string for this position (see chess_logic.to_fen)."""
+        ep = self.ep_square
+        return to_fen(
+            self.to_board(), COLORS[self.side], halfmove, fullmove,
+            en_passant=divmod(ep, 8) if ep is not None else None,
+        )
+
+    def to_board(self):
+        """Convert back to the list-of-dicts board."""
+        board = [[None for _ in range(8)] for _ in range(8)]
+        for sq, idx in enumerate(self.mailbox):
+            if idx != EMPTY:
+                color, ptype = divmod(idx, 6)
+                piece = create_piece(COLORS[color], PIECE_TYPES[ptype])
+                piece['has_moved'] = bool(self.moved >> sq & 1)
+                board[sq >> 3][sq & 7] = piece
+        return board
+
+    def copy(self):
+        pos = Position()
+        pos.bb        = self.bb[:]
+        pos.occ       = self.occ[:]
+        pos.mailbox   = self.mailbox[:]
+        pos.side      = self.side
+        pos.castling  = self.castling
+        pos.ep_square = self.ep_square
+        pos.moved     = self.moved
+        pos.king_sq   = self.king_sq[:]
+        pos.hash      = self.hash
+        pos.mg        = self.mg
+        pos.eg        = self.eg
+        pos.phase     = self.phase
+        return pos
+
+    @property
+    def turn(self):
+        return COLORS[self.side]
+
+    def compute_hash(self):
+        """Zobrist key from scratch — matches chess_logic.zobrist_hash()."""
+        key = ZOBRIST_CASTLING[self.castling]
+        for sq, idx in enumerate(self.mailbox):
+            if idx != EMPTY:
+                key ^= PIECE_KEYS[idx][sq]
+        if self.side == BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    def _castling_from_placement(self):
+        """Castling rights implied by unmoved kings and rooks at home."""
+        rights = 0
+        for king, rook, right, color in (
+            (60, 63, CASTLE_WK, WHITE), (60, 56, CASTLE_WQ, WHITE),
+            (4, 7, CASTLE_BK, BLACK),   (4, 0, CASTLE_BQ, BLACK),
+        ):
+            if self.mailbox[king] == color * 6 + KING and \
+               self.mailbox[rook] == color * 6 + ROOK and \
+               not (self.moved >> king & 1) and not (self.moved >> rook & 1):
+                rights |= right
+        return rights
+
+    # ── Low-level piece placement ──────────
+
+    def _put(self, idx, sq):
+        bit = 1 << sq
+        self.bb[idx] |= bit
+        self.occ[idx // 6] |= bit
+        self.mailbox[sq] = idx
+        self.mg += MG_SQUARE[idx][sq]
+        self.eg += EG_SQUARE[idx][sq]
+        self.phase += PHASE_BY_INDEX[idx]
+        if idx % 6 == KING:
+            self.king_sq[idx // 6] = sq
+
+    def _remove(self, idx, sq):
+        bit = 1 << sq
+        self.bb[idx] &= ~bit
+        self.occ[idx // 6] &= ~bit
+        self.mailbox[sq] = EMPTY
+        self.mg -= MG_SQUARE[idx][sq]
+        self.eg -= EG_SQUARE[idx][sq]
+        self.phase -= PHASE_BY_INDEX[idx]
+        if idx % 6 == KING:
+            self.king_sq[idx // 6] = -1
+
+    # ── Attacks & check ─────────────────────
+
+    def attackers(self, sq, by_color, occupied=None):
+        """Bitboard of `by_color` pieces attacking `sq`."""
+        if occupied is None:
+            occupied = self.occ[0] | self.occ[1]
+        bb = self.bb
+        base = by_color * 6
+        queens = bb[base + QUEEN]
+        return (
+            (PAWN_ATTACKS[by_color ^ 1][sq] & bb[base + PAWN]) |
+            (KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]) |
+            (KING_ATTACKS[sq] & bb[base + KING]) |
+            (bishop_attacks(sq, occupied) & (bb[base + BISHOP] | queens)) |
+            (rook_attacks(sq, occupied) & (bb[base + ROOK] | queens))
+        )
+
+    def is_square_attacked(self, sq, by_color, occupied=None):
+        """True if any piece of `by_color` attacks `sq`."""
+        bb = self.bb
+        base = by_color * 6
+        if PAWN_ATTACKS[by_color ^ 1][sq] & bb[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        if occupied is None:
+            occupied = self.occ[0] | self.occ[1]
+        queens = bb[base + QUEEN]
+        if bishop_attacks(sq, occupied) & (bb[base + BISHOP] | queens):
+            return True
+        if rook_attacks(sq, occupied) & (bb[base + ROOK] | queens):
+            return True
+        return False
+
+    def pins(self, color):
+        """
+        {square: mask} for every `color` piece pinned to its king.
+        The mask is the line it may still move along, pinner included.
+        """
+        king = self.king_sq[color]
+        pins = {}
+        if king < 0:
+            return pins
+        base = (color ^ 1) * 6
+        queens = self.bb[base + QUEEN]
+        own = self.occ[color]
+        occupied = own | self.occ[color ^ 1]
+        for rays, sliders in (
+            (ORTHOGONAL_RAYS, self.bb[base + ROOK] | queens),
+            (DIAGONAL_RAYS, self.bb[base + BISHOP] | queens),
+        ):
+            if not _slide(king, 0, rays) & sliders:
+                continue
+            for table, positive in rays:
+                blockers = table[king] & occupied
+                if not blockers:
+                    continue
+                # First two pieces along the ray, nearest first
+                if positive:
+                    first = (blockers & -blockers).bit_length() - 1
+                    rest = blockers ^ (1 << first)
+                    second = (rest & -rest).bit_length() - 1 if rest else -1
+                else:
+                    first = blockers.bit_length() - 1
+                    rest = blockers ^ (1 << first)
+                    second = rest.bit_length() - 1 if rest else -1
+                if second >= 0 and own >> first & 1 and sliders >> second & 1:
+                    pins[first] = BETWEEN[king][second] | (1 << second)
+        return pins
+
+    def _legal_filter(self, color):
+        """
+        (king, evasion mask, pins) for `color`. Non-king moves must land
+        inside the evasion mask (everything when not in check, only
+        capture/block squares in single check, nothing in double check).
+        """
+        king = self.king_sq[color]
+        if king < 0:
+            return king, FULL, {}
+        checkers = self.attackers(king, color ^ 1)
+        if not checkers:
+            evasion = FULL
+        elif checkers & (checkers - 1):
+            evasion = 0
+        else:
+            evasion = checkers | BETWEEN[king][checkers.bit_length() - 1]
+        return king, evasion, self.pins(color)
+
+    def _legal_targets_mask(self, sq, king, evasion, pins):
+        targets = self.valid_targets(sq)
+        if sq == king:
+            color = self.mailbox[sq] // 6
+            # Lift the king so sliders see through its old square
+            occupied = (self.occ[0] | self.occ[1]) ^ (1 << sq)
+            legal = 0
+            for to in iter_bits(targets):
+                if not self.is_square_attacked(to, color ^ 1, occupied):
+                    legal |= 1 << to
+            return legal
+        targets &= evasion
+        if sq in pins:
+            targets &= pins[sq]
+        return targets
+
+    def is_in_check(self, color=None):
+        """True if the king of `color` (default: side to move) is attacked."""
+        if color is None:
+            color = self.side
+        king = self.king_sq[color]
+        if king < 0:
+            return False
+        return self.is_square_attacked(king, color ^ 1)
+
+    # ── Move generation ─────────────────────
+
+    def valid_targets(self, sq):
+        """
+        Bitboard of squares the piece on `sq` can move to,
+        ignoring whether that leaves its own king in check.
+        """
+        idx = self.mailbox[sq]
+        if idx == EMPTY:
+            return 0
+        color, ptype = divmod(idx, 6)
+        own = self.occ[color]
+        occupied = own | self.occ[color ^ 1]
+
+        if ptype == PAWN:
+            bit = 1 << sq
+            if color == WHITE:
+                single = (bit >> 8) & ~occupied
+                targets = single
+                if single and 48 <= sq < 56:
+                    targets |= (single >> 8) & ~occupied
+            else:
+                single = (bit << 8) & ~occupied & FULL
+                targets = single
+                if single and 8 <= sq < 16:
+                    targets |= (single << 8) & ~occupied
+            return targets | (PAWN_ATTACKS[color][sq] & self.occ[color ^ 1])
+        if ptype == KNIGHT:
+            return KNIGHT_ATTACKS[sq] & ~own
+        if ptype == BISHOP:
+            return bishop_attacks(sq, occupied) & ~own
+        if ptype == ROOK:
+            return rook_attacks(sq, occupied) & ~own
+        if ptype == QUEEN:
+            return (bishop_attacks(sq, occupied) |
+                    rook_attacks(sq, occupied)) & ~own
+        return KING_ATTACKS[sq] & ~own
+
+    def _moves_from(self, sq, targets):
+        idx = self.mailbox[sq]
+        if idx % 6 != PAWN:
+            return [sq | (to << 6) for to in iter_bits(targets)]
+        promo_row = 0 if idx == WHITE * 6 + PAWN else 7
+        return [
+            encode_move(sq, to, (to >> 3) == promo_row)
+            for to in iter_bits(targets)
+        ]
+
+    def pseudo_moves(self, color=None):
+        """All moves for `color` (default: side to move), legal or not."""
+        if color is None:
+            color = self.side
+        moves = []
+        for sq in iter_bits(self.occ[color]):
+            moves.extend(self._moves_from(sq, self.valid_targets(sq)))
+        return moves
+
+    def is_legal(self, move):
+        """True if `move` doesn't leave the mover's own king in check."""
+        color = self.mailbox[move & 63] // 6
+        self.push(move)
+        legal = not self.is_in_check(color)
+        self.pop()
+        return legal
+
+    def legal_targets(self, sq):
+        """Legal destination squares for the piece on `sq`, as (row, col)."""
+        idx = self.mailbox[sq]
+        if idx == EMPTY:
+            return []
+        targets = self._legal_targets_mask(
+            sq, *self._legal_filter(idx // 6)
+        )
+        return [divmod(to, 8) for to in iter_bits(targets)]
+
+    def legal_moves(self, color=None):
+        """All legal moves for `color` (default: side to move)."""
+        if color is None:
+            color = self.side
+        king, evasion, pins = self._legal_filter(color)
+        moves = []
+        for sq in iter_bits(self.occ[color]):
+            targets = self._legal_targets_mask(sq, king, evasion, pins)
+            if targets:
+                moves.extend(self._moves_from(sq, targets))
+        return moves
+
+    # ── Make / unmake ───────────────────────
+
+    def push(self, move):
+        """Play `move` in place. Undo with pop()."""
+        frm = move & 63
+        to = (move >> 6) & 63
+        idx = self.mailbox[frm]
+        captured = self.mailbox[to]
+
+        self._stack.append(
+            (move, idx, captured, self.castling, self.ep_square,
+             self.moved, self.hash)
+        )
+
+        key = self.hash ^ ZOBRIST_BLACK_TO_MOVE ^ PIECE_KEYS[idx][frm]
+        if captured != EMPTY:
+            self._remove(captured, to)
+            key ^= PIECE_KEYS[captured][to]
+        self._remove(idx, frm)
+        placed = idx - PAWN + QUEEN if move & MOVE_PROMOTION else idx
+        self._put(placed, to)
+        key ^= PIECE_KEYS[placed][to]
+
+        self.moved = (self.moved & ~(1 << frm)) | (1 << to)
+        if frm in CASTLING_SQUARES or to in CASTLING_SQUARES:
+            key ^= ZOBRIST_CASTLING[self.castling]
+            self.castling &= ~(CASTLING_SQUARES.get(frm, 0) |
+                               CASTLING_SQUARES.get(to, 0))
+            key ^= ZOBRIST_CASTLING[self.castling]
+        self.hash = key
+
+        # Recorded for FEN/hashing only — en passant captures aren't allowed
+        if idx % 6 == PAWN and abs(to - frm) == 16:
+            self.ep_square = (frm + to) // 2
+        else:
+            self.ep_square = None
+
+        self.side ^= 1
+
+    def pop(self):
+        """Take back the last push()."""
+        move, idx, captured, castling, ep, moved, key = self._stack.pop()
+        frm = move & 63
+        to = (move >> 6) & 63
+
+        self._remove(self.mailbox[to], to)
+        if captured != EMPTY:
+            self._put(captured, to)
+        self._put(idx, frm)
+
+        self.castling  = castling
+        self.ep_square = ep
+        self.moved     = moved
+        self.hash      = key
+        self.side ^= 1
+
+
+# ─────────────────────────────────────────
+# PERFT
+# ─────────────────────────────────────────
+
+def perft(pos, depth):
+    """Number of leaf positions `depth` plies below `pos`."""
+    if depth == 0:
+        return 1
+    moves = pos.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        pos.push(move)
+        nodes += perft(pos, depth - 1)
+        pos.pop()
+    return nodes
+
+
+def perft_divide(pos, depth):
+    """{move: leaf count} for each legal root move — for finding bugs."""
+    counts = {}
+    for move in pos.legal_moves():
+        pos.push(move)
+        counts[move] = perft(pos, depth - 1)
+        pos.pop()
+    return counts
@@ -1,5 +1,4 @@
 import random
-import copy
 
 def create_piece(color, ptype):
     return {
@@ -46,6 +45,75 @@ def init_board():
     return board
 
 
+# ─────────────────────────────────────────
+# MOVE TABLES (precomputed once at import)
+# ─────────────────────────────────────────
+
+KNIGHT_JUMPS = [
+    (2,1),(2,-1),(-2,1),(-2,-1),
+    (1,2),(1,-2),(-1,2),(-1,-2)
+]
+KING_STEPS = [
+    (dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc
+]
+ROOK_DIRECTIONS   = [(1,0),(-1,0),(0,1),(0,-1)]
+BISHOP_DIRECTIONS = [(1,1),(1,-1),(-1,1),(-1,-1)]
+QUEEN_DIRECTIONS  = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+
+def _on_board_steps(steps):
+    """TABLE[row][col] → in-bounds squares one step away."""
+    return [
+        [
+            [(r + dr, c + dc) for dr, dc in steps
+             if 0 <= r + dr < 8 and 0 <= c + dc < 8]
+            for c in range(8)
+        ]
+        for r in range(8)
+    ]
+
+
+def _rays(directions):
+    """TABLE[row][col] → one list of squares per direction, nearest first."""
+    table = []
+    for r in range(8):
+        row_rays = []
+        for c in range(8):
+            square_rays = []
+            for dr, dc in directions:
+                ray = []
+                rr, cc = r + dr, c + dc
+                while 0 <= rr < 8 and 0 <= cc < 8:
+                    ray.append((rr, cc))
+                    rr += dr
+                    cc += dc
+                square_rays.append(ray)
+            row_rays.append(square_rays)
+        table.append(row_rays)
+    return table
+
+
+KNIGHT_TARGETS = _on_board_steps(KNIGHT_JUMPS)
+KING_TARGETS   = _on_board_steps(KING_STEPS)
+
+# Squares a pawn of each color captures on (one row forward, diagonally)
+PAWN_CAPTURES = {
+    'white': _on_board_steps([(-1, -1), (-1, 1)]),
+    'black': _on_board_steps([(1, -1), (1, 1)]),
+}
+
+# Rays in QUEEN_DIRECTIONS order: 4 orthogonal rays, then 4 diagonal
+QUEEN_RAYS  = _rays(QUEEN_DIRECTIONS)
+ROOK_RAYS   = [[rays[:4] for rays in row] for row in QUEEN_RAYS]
+BISHOP_RAYS = [[rays[4:] for rays in row] for row in QUEEN_RAYS]
+
+SLIDING_RAYS = {
+    'rook':   ROOK_RAYS,
+    'bishop': BISHOP_RAYS,
+    'queen':  QUEEN_RAYS,
+}
+
+
 def get_valid_moves(board, piece, row, col):
     """
     Returns list of (row, col) tuples this piece can move to.
@@ -57,14 +125,6 @@ def get_valid_moves(board, piece, row, col):
     ptype   = piece['type']
     opponent = 'black' if color == 'white' else 'white'
 
-    # Directions for sliding pieces
-    sliding_directions = {
-        'rook':   [(1,0),(-1,0),(0,1),(0,-1)],
-        'bishop': [(1,1),(1,-1),(-1,1),(-1,-1)],
-        'queen':  [(1,0),(-1,0),(0,1),(0,-1),
-                   (1,1),(1,-1),(-1,1),(-1,-1)],
-    }
-
     # ── PAWN ───────────────────────────────
     if ptype == 'pawn':
         # White moves UP (row decreases), black moves DOWN (row increases)
@@ -81,80 +141,145 @@ def get_valid_moves(board, piece, row, col):
                 moves.append((row + 2*direction, col))
 
         # Diagonal captures
-        for dc in [-1, 1]:
-            nc = col + dc
-            if 0 <= new_row < 8 and 0 <= nc < 8:
-                target = board[new_row][nc]
-                if target and target['color'] == opponent:
-                    moves.append((new_row, nc))
+        for r, c in PAWN_CAPTURES[color][row][col]:
+            target = board[r][c]
+            if target and target['color'] == opponent:
+                moves.append((r, c))
 
     # ── SLIDING PIECES (rook, bishop, queen) ──
-    elif ptype in sliding_directions:
-        for dr, dc in sliding_directions[ptype]:
-            r, c = row + dr, col + dc
-            while 0 <= r < 8 and 0 <= c < 8:
-                if board[r][c] is None:
+    elif ptype in SLIDING_RAYS:
+        for ray in SLIDING_RAYS[ptype][row][col]:
+            for r, c in ray:
+                target = board[r][c]
+                if target is None:
                     # Empty square — can move here and keep going
                     moves.append((r, c))
-                elif board[r][c]['color'] == opponent:
-                    # Enemy piece — can capture but can't go further
-                    moves.append((r, c))
-                    break
                 else:
+                    # Enemy piece — can capture but can't go further
+                    if target['color'] == opponent:
+                        moves.append((r, c))
                     # Own piece — blocked
                     break
-                r += dr
-                c += dc
-
-    # ── KNIGHT ─────────────────────────────
-    elif ptype == 'knight':
-        # L-shaped jumps — can leap over other pieces
-        jumps = [
-            (2,1),(2,-1),(-2,1),(-2,-1),
-            (1,2),(1,-2),(-1,2),(-1,-2)
-        ]
-        for dr, dc in jumps:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                target = board[r][c]
-                if target is None or target['color'] == opponent:
-                    moves.append((r, c))
 
-    # ── KING ───────────────────────────────
-    elif ptype == 'king':
-        # One square in any direction
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    target = board[r][c]
-                    if target is None or target['color'] == opponent:
-                        moves.append((r, c))
+    # ── KNIGHT / KING ──────────────────────
+    # Fixed jumps — knights can leap over other pieces
+    elif ptype == 'knight' or ptype == 'king':
+        targets = KNIGHT_TARGETS if ptype == 'knight' else KING_TARGETS
+        for r, c in targets[row][col]:
+            target = board[r][c]
+            if target is None or target['color'] == opponent:
+                moves.append((r, c))
 
     return moves
 
 
+# ─────────────────────────────────────────
+# POSITION HASHING (Zobrist)
+# ─────────────────────────────────────────
+# Fixed seed so every process (and anything stored in the database)
+# agrees on the same keys.
+
+_zobrist_rng = random.Random(0x5EED_C4E55)
+
+ZOBRIST_PIECES = {
+    (color, ptype): [_zobrist_rng.getrandbits(64) for _ in range(64)]
+    for color in ('white', 'black')
+    for ptype in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+# One key per castling right; ZOBRIST_CASTLING[rights] XORs the set ones
+_castling_keys = [_zobrist_rng.getrandbits(64) for _ in range(4)]
+ZOBRIST_CASTLING = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights >> _bit & 1:
+            ZOBRIST_CASTLING[_rights] ^= _castling_keys[_bit]
+
+# (right bit, king square, rook square, color)
+CASTLING_RIGHTS = [
+    (1, (7, 4), (7, 7), 'white'),
+    (2, (7, 4), (7, 0), 'white'),
+    (4, (0, 4), (0, 7), 'black'),
+    (8, (0, 4), (0, 0), 'black'),
+]
+CASTLING_SQUARES = {(7, 4), (7, 7), (7, 0), (0, 4), (0, 7), (0, 0)}
+
+
+def castling_rights(board):
+    """
+    Castling rights as a 4-bit mask (white king-side = 1, white
+    queen-side = 2, black king-side = 4, black queen-side = 8).
+    A right stands while its king and rook are home and unmoved.
+    """
+    rights = 0
+    for bit, (kr, kc), (rr, rc), color in CASTLING_RIGHTS:
+        king, rook = board[kr][kc], board[rr][rc]
+        if king and rook and \
+           king['type'] == 'king' and king['color'] == color and \
+           rook['type'] == 'rook' and rook['color'] == color and \
+           not king['has_moved'] and not rook['has_moved']:
+            rights |= bit
+    return rights
+
+
+def zobrist_hash(board, turn='white'):
+    """
+    64-bit Zobrist key for the board with `turn` to move.
+    Covers piece placement, side to move and castling rights.
+    En passant captures aren't part of these rules, so an
+    en-passant square never changes the key.
+    """
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p:
+                key ^= ZOBRIST_PIECES[(p['color'], p['type'])][r * 8 + c]
+    if turn == 'black':
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    return key ^ ZOBRIST_CASTLING[castling_rights(board)]
+
+
 # ─────────────────────────────────────────
 # APPLYING MOVES
 # ─────────────────────────────────────────
 
-def apply_move(board, from_row, from_col, to_row, to_col):
+def make_move(board, from_row, from_col, to_row, to_col):
     """
-    Apply a move and return a NEW board (original unchanged).
-    Also handles pawn promotion automatically.
+    Apply a move IN PLACE and return an undo record.
+    Pass the record to unmake_move() to restore the board exactly.
+    Handles pawn promotion like apply_move().
+
+    undo['hash_delta'] is the XOR that turns the Zobrist key before
+    the move into the key after it (side to move flips too), so
+    callers can keep a running key with `key ^= undo['hash_delta']`.
     """
-    # Deep copy so we don't modify the original board
-    new_board = copy.deepcopy(board)
+    piece    = board[from_row][from_col]
+    captured = board[to_row][to_col]
+
+    undo = {
+        'from':      (from_row, from_col),
+        'to':        (to_row, to_col),
+        'captured':  captured,
+        'had_moved': piece['has_moved'],
+        'promoted':  False,
+    }
 
-    piece = new_board[from_row][from_col]
+    touches_castling = (from_row, from_col) in CASTLING_SQUARES or \
+        (to_row, to_col) in CASTLING_SQUARES
+    if touches_castling:
+        rights_before = castling_rights(board)
 
-    # Move piece to new square
-    new_board[to_row][to_col] = piece
-    new_board[from_row][from_col] = None
+    from_sq = from_row * 8 + from_col
+    to_sq   = to_row * 8 + to_col
+    delta = ZOBRIST_BLACK_TO_MOVE ^ \
+        ZOBRIST_PIECES[(piece['color'], piece['type'])][from_sq]
+    if captured:
+        delta ^= ZOBRIST_PIECES[(captured['color'], captured['type'])][to_sq]
 
-    # Mark piece as moved (used for castling / two-square pawn rule)
+    board[to_row][to_col] = piece
+    board[from_row][from_col] = None
     piece['has_moved'] = True
 
     # ── Pawn Promotion ──────────────────────
@@ -163,7 +288,43 @@ def apply_move(board, from_row, from_col, to_row, to_col):
         if (piece['color'] == 'white' and to_row == 0) or \
            (piece['color'] == 'black' and to_row == 7):
             piece['type'] = 'queen'
+            undo['promoted'] = True
+
+    delta ^= ZOBRIST_PIECES[(piece['color'], piece['type'])][to_sq]
+    if touches_castling:
+        delta ^= ZOBRIST_CASTLING[rights_before] ^ \
+            ZOBRIST_CASTLING[castling_rights(board)]
+    undo['hash_delta'] = delta
+
+    return undo
 
+
+def unmake_move(board, undo):
+    """Take back a move made with make_move()."""
+    from_row, from_col = undo['from']
+    to_row, to_col     = undo['to']
+
+    piece = board[to_row][to_col]
+    piece['has_moved'] = undo['had_moved']
+    if undo['promoted']:
+        piece['type'] = 'pawn'
+
+    board[from_row][from_col] = piece
+    board[to_row][to_col] = undo['captured']
+
+
+def copy_board(board):
+    """Copy a board. Pieces are flat dicts, so a shallow copy each is enough."""
+    return [[dict(p) if p else None for p in row] for row in board]
+
+
+def apply_move(board, from_row, from_col, to_row, to_col):
+    """
+    Apply a move and return a NEW board (original unchanged).
+    Also handles pawn promotion automatically.
+    """
+    new_board = copy_board(board)
+    make_move(new_board, from_row, from_col, to_row, to_col)
     return new_board
 
 
@@ -181,66 +342,238 @@ def find_king(board, color):
     return None
 
 
-def is_in_check(board, color):
+def king_squares(board):
+    """
+    {'white': (row, col), 'black': (row, col)} from one scan, None for
+    a missing king. Callers that play moves keep it up to date with
+    track_king() instead of scanning again.
+    """
+    kings = {'white': None, 'black': None}
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p and p['type'] == 'king':
+                kings[p['color']] = (r, c)
+    return kings
+
+
+def track_king(kings, board, undo):
+    """
+    Update king_squares() after make_move() (or, with the board taken
+    back, after unmake_move()) — only a king move changes it.
+    """
+    for square in (undo['to'], undo['from']):
+        p = board[square[0]][square[1]]
+        if p and p['type'] == 'king':
+            kings[p['color']] = square
+            return
+
+
+def is_square_attacked(board, square, by_color):
+    """
+    Returns True if any `by_color` piece attacks `square`.
+    Works outward from the square instead of generating
+    every opponent move.
+    """
+    row, col = square
+
+    # Pawns — attackers sit where an opposing pawn here would capture
+    defender = 'black' if by_color == 'white' else 'white'
+    for r, c in PAWN_CAPTURES[defender][row][col]:
+        p = board[r][c]
+        if p and p['color'] == by_color and p['type'] == 'pawn':
+            return True
+
+    # Knights and king — fixed offsets
+    for targets, ptype in ((KNIGHT_TARGETS, 'knight'),
+                           (KING_TARGETS, 'king')):
+        for r, c in targets[row][col]:
+            p = board[r][c]
+            if p and p['color'] == by_color and p['type'] == ptype:
+                return True
+
+    # Sliding pieces — walk each ray until the first blocker
+    for i, ray in enumerate(QUEEN_RAYS[row][col]):
+        slider = 'rook' if i < 4 else 'bishop'
+        for r, c in ray:
+            p = board[r][c]
+            if p:
+                if p['color'] == by_color and p['type'] in (slider, 'queen'):
+                    return True
+                break
+
+    return False
+
+
+def is_in_check(board, color, king_pos=None):
     """
     Returns True if the king of `color` is currently under attack.
-    We check if any opponent piece can reach the king's square.
+    Pass `king_pos` when the caller already knows where the king is.
     """
-    king_pos = find_king(board, color)
+    if king_pos is None:
+        king_pos = find_king(board, color)
     if not king_pos:
         return False
 
     opponent = 'black' if color == 'white' else 'white'
+    return is_square_attacked(board, king_pos, opponent)
 
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece['color'] == opponent:
-                # Can this opponent piece reach our king?
-                if king_pos in get_valid_moves(board, piece, r, c):
-                    return True
-    return False
 
+def find_pins(board, color, king_pos):
+    """
+    Returns {(row, col): (dr, dc)} for every `color` piece pinned
+    to its king, with the direction from the king to the pinner.
+    """
+    pins = {}
+    king_row, king_col = king_pos
+
+    rays = QUEEN_RAYS[king_row][king_col]
+    for i, (direction, ray) in enumerate(zip(QUEEN_DIRECTIONS, rays)):
+        slider = 'rook' if i < 4 else 'bishop'
+        shield = None
+        for r, c in ray:
+            p = board[r][c]
+            if p:
+                if p['color'] == color:
+                    if shield:
+                        break          # two own pieces — no pin
+                    shield = (r, c)
+                else:
+                    if shield and p['type'] in (slider, 'queen'):
+                        pins[shield] = direction
+                    break
 
-def get_legal_moves(board, piece, row, col):
+    return pins
+
+
+def _on_line(origin, direction, square):
+    """True if `square` lies on the ray from `origin` along `direction`."""
+    dr, dc = direction
+    r, c = square[0] - origin[0], square[1] - origin[1]
+    return r * dc == c * dr and r * dr >= 0 and c * dc >= 0
+
+
+def _legal_moves(board, piece, row, col, king_pos, in_check, pins):
+    """
+    get_legal_moves() with the king square, check flag and pins
+    already worked out, so callers looping over many pieces
+    only compute them once.
+    """
+    candidates = get_valid_moves(board, piece, row, col)
+    opponent = 'black' if piece['color'] == 'white' else 'white'
+
+    # ── King: the destination must not be attacked ──
+    # Lift the king first so sliders see through its old square
+    if piece['type'] == 'king':
+        board[row][col] = None
+        legal = [
+            move for move in candidates
+            if not is_square_attacked(board, move, opponent)
+        ]
+        board[row][col] = piece
+        return legal
+
+    if king_pos is None:
+        return candidates
+
+    # ── In check: try each move against the king square ──
+    if in_check:
+        legal = []
+        for move in candidates:
+            undo = make_move(board, row, col, move[0], move[1])
+            if not is_square_attacked(board, king_pos, opponent):
+                legal.append(move)
+            unmake_move(board, undo)
+        return legal
+
+    # ── Not in check: only pinned pieces are restricted ──
+    pin = pins.get((row, col))
+    if pin:
+        return [move for move in candidates if _on_line(king_pos, pin, move)]
+    return candidates
+
+
+def get_legal_moves(board, piece, row, col, king_pos=None):
     """
     Returns only moves that don't leave own king in check.
     This is the FINAL list of moves a player can actually make.
+    Pass `king_pos` when the caller already knows where the king is.
     """
-    legal = []
-    candidates = get_valid_moves(board, piece, row, col)
+    color = piece['color']
+    if king_pos is None:
+        king_pos = find_king(board, color)
+    if king_pos is None:
+        return get_valid_moves(board, piece, row, col)
+
+    return _legal_moves(
+        board, piece, row, col, king_pos,
+        is_in_check(board, color, king_pos),
+        find_pins(board, color, king_pos),
+    )
 
-    for move in candidates:
-        # Try the move on a test board
-        test_board = apply_move(board, row, col, move[0], move[1])
-        # Only keep the move if it doesn't leave our king in check
-        if not is_in_check(test_board, piece['color']):
-            legal.append(move)
 
-    return legal
+def iter_legal_moves(board, color, king_pos=None):
+    """
+    Yields (from_row, from_col, to_row, to_col) for every legal move
+    of `color`. The king square, check and pins are found once; pass
+    `king_pos` when the caller already knows the king square.
+    """
+    if king_pos is None:
+        king_pos = find_king(board, color)
+    in_check = king_pos is not None and is_in_check(board, color, king_pos)
+    yield from _all_legal_moves(board, color, king_pos, in_check)
+
+
+def _all_legal_moves(board, color, king_pos, in_check):
+    pins = find_pins(board, color, king_pos) if king_pos else {}
+
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece and piece['color'] == color:
+                for move in _legal_moves(board, piece, r, c,
+                                         king_pos, in_check, pins):
+                    yield (r, c, move[0], move[1])
 
 
 # ─────────────────────────────────────────
 # GAME STATE CHECKS
 # ─────────────────────────────────────────
 
+def game_outcome(board, color, king_pos=None):
+    """
+    Where the game stands for `color`, to move, and its legal moves,
+    from one pass over the board:
+
+        ('checkmate' | 'stalemate' | 'check' | 'ongoing', [moves])
+
+    with moves as (from_row, from_col, to_row, to_col). `king_pos` is
+    as for iter_legal_moves().
+    """
+    if king_pos is None:
+        king_pos = find_king(board, color)
+    in_check = king_pos is not None and is_in_check(board, color, king_pos)
+    moves = list(_all_legal_moves(board, color, king_pos, in_check))
+
+    if not moves:
+        return ('checkmate' if in_check else 'stalemate'), moves
+    return ('check' if in_check else 'ongoing'), moves
+
+
 def is_checkmate(board, color):
     """
     Returns True if `color` is in checkmate.
     Checkmate = in check AND no legal moves exist.
     """
     # Must be in check first
-    if not is_in_check(board, color):
+    king_pos = find_king(board, color)
+    if not is_in_check(board, color, king_pos):
         return False
 
     # Check if ANY piece has ANY legal move
-    for r in range(8):
-        for c in range(8):
-            piece = board[r][c]
-            if piece and piece['color'] == color:
-                if get_legal_moves(board, piece, r, c):
-                    # Found at least one legal move → not checkmate
-                    return False
+    for _ in iter_legal_moves(board, color, king_pos):
+        # Found at least one legal move → not checkmate
+        return False
 
     # In check + zero legal moves = checkmate
     return True
@@ -251,37 +584,263 @@ def is_stalemate(board, color):
     Returns True if `color` is in stalemate.
     Stalemate = NOT in check BUT no legal moves exist (it's a draw).
     """
-    if is_in_check(board, color):
+    king_pos = find_king(board, color)
+    if is_in_check(board, color, king_pos):
+        return False
+
+    for _ in iter_legal_moves(board, color, king_pos):
         return False
+    return True
+
 
+def insufficient_material(board):
+    """
+    True when neither side can ever mate: bare kings, one minor piece,
+    or only bishops, all on squares of one color.
+    """
+    minors = []
     for r in range(8):
         for c in range(8):
-            piece = board[r][c]
-            if piece and piece['color'] == color:
-                if get_legal_moves(board, piece, r, c):
-                    return False
-    return True
+            p = board[r][c]
+            if not p or p['type'] == 'king':
+                continue
+            if p['type'] not in ('knight', 'bishop'):
+                return False
+            minors.append((p['type'], (r + c) % 2))
+
+    if len(minors) <= 1:
+        return True
+    return all(ptype == 'bishop' for ptype, _ in minors) and \
+        len({shade for _, shade in minors}) == 1
+
+
+# ─────────────────────────────────────────
+# COMPACT ENCODING (GameSession storage)
+# ─────────────────────────────────────────
+# 40 bytes: one nibble per square, row 0 first, two squares per byte
+# (high nibble first), then a little-endian 64-bit mask of the squares
+# whose piece has moved. Nibble 0 is an empty square; otherwise bit 3
+# is the color (set for black) and the low bits index PIECE_TYPES.
+
+PIECE_TYPES = ['pawn', 'knight', 'bishop', 'rook', 'queen', 'king']
+PACKED_BOARD_SIZE = 40
+
+_PIECE_CODES = {
+    (color, ptype): (8 if color == 'black' else 0) | (i + 1)
+    for color in ('white', 'black')
+    for i, ptype in enumerate(PIECE_TYPES)
+}
+_CODE_PIECES = {code: piece for piece, code in _PIECE_CODES.items()}
+# byte → the two squares it holds, as (color, type) or None
+_BYTE_SQUARES = [
+    (_CODE_PIECES.get(b >> 4), _CODE_PIECES.get(b & 15)) for b in range(256)
+]
+
+
+def pack_board(board):
+    """Board → PACKED_BOARD_SIZE bytes (see unpack_board)."""
+    codes = []
+    moved = 0
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p:
+                codes.append(_PIECE_CODES[(p['color'], p['type'])])
+                if p['has_moved']:
+                    moved |= 1 << (r * 8 + c)
+            else:
+                codes.append(0)
+    return bytes(
+        codes[i] << 4 | codes[i + 1] for i in range(0, 64, 2)
+    ) + moved.to_bytes(8, 'little')
+
+
+def unpack_board(data):
+    """Bytes from pack_board() → a new board."""
+    if len(data) != PACKED_BOARD_SIZE:
+        raise ValueError(f'packed board must be {PACKED_BOARD_SIZE} bytes')
+    moved = int.from_bytes(data[32:], 'little')
+    board = []
+    sq = 0
+    for r in range(8):
+        row = []
+        for byte in data[r * 4:r * 4 + 4]:
+            for piece in _BYTE_SQUARES[byte]:
+                if piece:
+                    row.append({
+                        'color':     piece[0],
+                        'type':      piece[1],
+                        'has_moved': bool(moved >> sq & 1),
+                    })
+                else:
+                    row.append(None)
+                sq += 1
+        board.append(row)
+    return board
 
 
-def ai_move(board):
+# ─────────────────────────────────────────
+# FEN
+# ─────────────────────────────────────────
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+FEN_LETTERS = 'pnbrqk'      # in PIECE_TYPES order
+CASTLING_LETTERS = 'KQkq'   # bits 1, 2, 4, 8 of castling_rights()
+
+_FEN_PIECES = {
+    (letter.upper() if color == 'white' else letter): (color, ptype)
+    for color in ('white', 'black')
+    for letter, ptype in zip(FEN_LETTERS, PIECE_TYPES)
+}
+_PIECE_LETTERS = {piece: letter for letter, piece in _FEN_PIECES.items()}
+
+
+def to_fen(board, turn='white', halfmove=0, fullmove=1, en_passant=None):
+    """
+    FEN string for `board` with `turn` to move. Castling rights come
+    from castling_rights(). En passant captures aren't part of these
+    rules, so the en-passant field is '-' unless a (row, col) square
+    is passed as `en_passant`.
     """
-    Simple AI: picks a random legal move for black.
-    Returns (from_row, from_col, to_row, to_col) or None.
+    rows = []
+    for row in board:
+        text, empty = '', 0
+        for p in row:
+            if not p:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            text += _PIECE_LETTERS[(p['color'], p['type'])]
+        if empty:
+            text += str(empty)
+        rows.append(text)
+
+    rights = castling_rights(board)
+    castling = ''.join(
+        letter for i, letter in enumerate(CASTLING_LETTERS) if rights >> i & 1
+    ) or '-'
+    side = 'w' if turn == 'white' else 'b'
+    ep = '-'
+    if en_passant:
+        ep = 'abcdefgh'[en_passant[1]] + str(8 - en_passant[0])
+    return f"{'/'.join(rows)} {side} {castling} {ep} {halfmove} {fullmove}"
+
+
+def parse_fen(fen):
+    """
+    Every field of a FEN string: (board, turn, en_passant, halfmove,
+    fullmove). `en_passant` is a (row, col) or None; missing clocks
+    count as 0 and 1. Raises ValueError if it can't be parsed.
 
-    In Phase 10 we can upgrade this to a smarter AI.
+    FEN has no has_moved flags, so a piece counts as unmoved only while
+    it stands on its start square — and for kings and rooks, only while
+    a matching castling right is present.
     """
-    all_moves = []
+    fields = fen.split()
+    if not 2 <= len(fields) <= 6 or fields[1] not in ('w', 'b'):
+        raise ValueError(f'Invalid FEN: {fen!r}')
+    # Castling, en passant and the two clocks, defaulted when missing
+    defaults = ['-', '-', '0', '1']
+    castling, ep, halfmove, fullmove = fields[2:] + defaults[len(fields) - 2:]
+    rows = fields[0].split('/')
+    if len(rows) != 8:
+        raise ValueError(f'Invalid FEN: {fen!r}')
+
+    board = []
+    for text in rows:
+        row = []
+        for ch in text:
+            if ch in '12345678':
+                row.extend([None] * int(ch))
+            elif ch in _FEN_PIECES:
+                row.append(create_piece(*_FEN_PIECES[ch]))
+            else:
+                raise ValueError(f'Invalid FEN: {fen!r}')
+        if len(row) != 8:
+            raise ValueError(f'Invalid FEN: {fen!r}')
+        board.append(row)
+
+    en_passant = None
+    if ep != '-':
+        if len(ep) != 2 or ep[0] not in 'abcdefgh' or ep[1] not in '36':
+            raise ValueError(f'Invalid FEN: {fen!r}')
+        en_passant = (8 - int(ep[1]), 'abcdefgh'.index(ep[0]))
+    if not (halfmove.isdigit() and fullmove.isdigit()) or int(fullmove) < 1:
+        raise ValueError(f'Invalid FEN: {fen!r}')
+
+    rights = 0
+    for i, letter in enumerate(CASTLING_LETTERS):
+        if letter in castling:
+            rights |= 1 << i
+    # Squares whose king or rook still holds a castling right
+    castlers = {
+        square
+        for bit, king_sq, rook_sq, _ in CASTLING_RIGHTS if rights & bit
+        for square in (king_sq, rook_sq)
+    }
 
+    start = init_board()
     for r in range(8):
         for c in range(8):
-            piece = board[r][c]
-            if piece and piece['color'] == 'black':
-                legal = get_legal_moves(board, piece, r, c)
-                for move in legal:
-                    all_moves.append((r, c, move[0], move[1]))
+            p, home = board[r][c], start[r][c]
+            if not p:
+                continue
+            unmoved = home is not None and \
+                (home['color'], home['type']) == (p['color'], p['type'])
+            if p['type'] in ('king', 'rook'):
+                unmoved = unmoved and (r, c) in castlers
+            p['has_moved'] = not unmoved
+
+    turn = 'white' if fields[1] == 'w' else 'black'
+    return board, turn, en_passant, int(halfmove), int(fullmove)
+
 
-    if all_moves:
-        return random.choice(all_moves)
+def from_fen(fen):
+    """(board, turn) for a FEN string; see parse_fen()."""
+    board, turn, _, _, _ = parse_fen(fen)
+    return board, turn
 
-    # No moves available (checkmate or stalemate)
-    return None
\ No newline at end of file
+
+# ─────────────────────────────────────────
+# PERFT (move generator testing / benchmarking)
+# ─────────────────────────────────────────
+
+def perft(board, depth, turn='white', kings=None):
+    """
+    Number of leaf positions `depth` plies below `board`. The king
+    squares are tracked move by move rather than searched for.
+    """
+    if kings is None:
+        kings = king_squares(board)
+    if depth == 0:
+        return 1
+    moves = list(iter_legal_moves(board, turn, kings[turn]))
+    if depth == 1:
+        return len(moves)
+
+    other = 'black' if turn == 'white' else 'white'
+    nodes = 0
+    for r, c, tr, tc in moves:
+        undo = make_move(board, r, c, tr, tc)
+        track_king(kings, board, undo)
+        nodes += perft(board, depth - 1, other, kings)
+        unmake_move(board, undo)
+        track_king(kings, board, undo)
+    return nodes
+
+
+def perft_divide(board, depth, turn='white'):
+    """{(from_row, from_col, to_row, to_col): leaf count} per root move."""
+    other = 'black' if turn == 'white' else 'white'
+    kings = king_squares(board)
+    counts = {}
+    for r, c, tr, tc in list(iter_legal_moves(board, turn, kings[turn])):
+        undo = make_move(board, r, c, tr, tc)
+        track_king(kings, board, undo)
+        counts[(r, c, tr, tc)] = perft(board, depth - 1, other, kings)
+        unmake_move(board, undo)
+        track_king(kings, board, undo)
+    return counts
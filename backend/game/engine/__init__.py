@@ -0,0 +1,5 @@
+from .search import ai_move
+from .parallel import parallel_search
+from .config import difficulty_budget
+
+__all__ = ['ai_move', 'parallel_search', 'difficulty_budget']
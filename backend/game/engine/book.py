@@ -0,0 +1,234 @@
+"""
+Opening book.
+
+The book file is a flat array of 12-byte records, sorted by key:
+
+    key     u64   Zobrist key of the position (Position.hash)
+    move    u16   engine move code (from | to << 6 | flags)
+    weight  u16   how often the move was played
+
+It is opened with mmap and searched in place, so there is nothing to
+load, and every worker process shares the same pages of the OS cache.
+Build one from a PGN file with `python manage.py build_book`.
+"""
+
+import mmap
+import os
+import random
+import re
+import struct
+
+from ..bitboard import (
+    Position, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, parse_square
+)
+from ..chess_logic import START_FEN
+from .config import engine_setting
+
+
+RECORD = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    """Read-only view of a book file."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size % RECORD.size:
+                raise ValueError(f'{self.path} is not a book file')
+            # mmap of an empty file isn't allowed
+            self._data = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if size else b''
+            )
+        self.count = size // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def _key_at(self, i):
+        return RECORD.unpack_from(self._data, i * RECORD.size)[0]
+
+    def entries(self, key):
+        """[(move, weight), ...] stored for `key`, heaviest first."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < self.count:
+            entry_key, move, weight = RECORD.unpack_from(
+                self._data, lo * RECORD.size
+            )
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            lo += 1
+        return found
+
+    def choose(self, pos, rng=random):
+        """
+        A book move for `pos`, picked at random in proportion to its
+        weight, or None. Entries that aren't legal here (a key
+        collision) are ignored.
+        """
+        entries = self.entries(pos.hash)
+        if not entries:
+            return None
+        legal = set(pos.legal_moves())
+        entries = [(m, w) for m, w in entries if m in legal]
+        if not entries:
+            return None
+        moves, weights = zip(*entries)
+        return rng.choices(moves, weights)[0]
+
+    def close(self):
+        if self._data:
+            self._data.close()
+
+
+def write_book(path, counts):
+    """Write {(key, move): weight} to `path` in book order."""
+    records = sorted(
+        ((key, -min(weight, MAX_WEIGHT), move)
+         for (key, move), weight in counts.items()),
+    )
+    with open(path, 'wb') as f:
+        for key, neg_weight, move in records:
+            f.write(RECORD.pack(key, move, -neg_weight))
+    return len(records)
+
+
+_books = {}
+
+
+def shared_book():
+    """
+    The book named by CHESS_ENGINE['BOOK_PATH'] for this process, or
+    None when there is no book file.
+    """
+    path = engine_setting('BOOK_PATH')
+    if not path or not os.path.exists(path):
+        return None
+    path = str(path)
+    mtime = os.path.getmtime(path)
+    cached = _books.get(path)
+    if cached is None or cached[0] != mtime:
+        _books[path] = (mtime, OpeningBook(path))
+    return _books[path][1]
+
+
+def book_move(pos):
+    """A move from the shared book for `pos`, or None."""
+    book = shared_book()
+    return book.choose(pos) if book else None
+
+
+# ─────────────────────────────────────────
+# PGN
+# ─────────────────────────────────────────
+
+SAN_PATTERN = re.compile(
+    r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=([NBRQ]))?$'
+)
+SAN_PIECES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+_PGN_NOISE = re.compile(
+    r'\{[^}]*\}'            # {comments}
+    r'|;[^\n]*'             # ; comments
+    r'|\$\d+'               # NAGs
+    r'|\d+\.(?:\.\.)?'      # move numbers
+)
+RESULTS = {'1-0', '0-1', '1/2-1/2', '*'}
+
+
+def _strip_variations(text):
+    depth, out = 0, []
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(depth - 1, 0)
+        elif not depth:
+            out.append(ch)
+    return ''.join(out)
+
+
+def read_pgn(lines):
+    """
+    Yield each game in a PGN file as a list of SAN moves. Tags,
+    comments, NAGs and variations are dropped.
+    """
+    movetext = []
+
+    def finish():
+        text = _strip_variations(_PGN_NOISE.sub(' ', ' '.join(movetext)))
+        movetext.clear()
+        return [t for t in text.split() if t not in RESULTS]
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('['):
+            if movetext:
+                yield finish()
+            continue
+        movetext.append(line)
+        if line.split()[-1] in RESULTS:
+            yield finish()
+    if movetext:
+        yield finish()
+
+
+def parse_san(pos, san):
+    """
+    The legal move in `pos` written as `san`, or None — also None for
+    moves these rules don't allow (castling, en passant,
+    under-promotion).
+    """
+    match = SAN_PATTERN.match(san.rstrip('+#!?'))
+    if not match:
+        return None
+    letter, file_, rank, target, promotion = match.groups()
+    if promotion and promotion != 'Q':
+        return None
+    ptype = SAN_PIECES[letter] if letter else PAWN
+    to = parse_square(target)
+
+    found = None
+    for move in pos.legal_moves():
+        frm = move & 63
+        if (move >> 6) & 63 != to or pos.mailbox[frm] % 6 != ptype:
+            continue
+        if file_ and 'abcdefgh'[frm & 7] != file_:
+            continue
+        if rank and str(8 - (frm >> 3)) != rank:
+            continue
+        if found is not None:
+            return None    # ambiguous
+        found = move
+    return found
+
+
+def book_counts(games, max_plies, counts=None):
+    """
+    Tally {(key, move): times played} over the first `max_plies` of
+    each game (a list of SAN moves). A game stops counting at the first
+    move this engine can't play.
+    """
+    counts = {} if counts is None else counts
+    for game in games:
+        pos = Position.from_fen(START_FEN)
+        for san in game[:max_plies]:
+            move = parse_san(pos, san)
+            if move is None:
+                break
+            counts[(pos.hash, move)] = counts.get((pos.hash, move), 0) + 1
+            pos.push(move)
+    return counts
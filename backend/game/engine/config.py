@@ -0,0 +1,65 @@
+"""
+Engine settings, read from settings.CHESS_ENGINE with these defaults.
+"""
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    # Transposition table size per worker process
+    'TT_SIZE_MB': 16,
+
+    # Search budget per difficulty level. Any of depth / time_ms / nodes
+    # may be None for "no limit"; the search stops at whichever hits first.
+    # A level may also set 'workers' to override SEARCH_WORKERS.
+    'DIFFICULTY': {
+        'easy':   {'depth': 1,    'time_ms': 200,  'nodes': 2000},
+        'medium': {'depth': 3,    'time_ms': 1000, 'nodes': None},
+        'hard':   {'depth': None, 'time_ms': 3000, 'nodes': None},
+    },
+
+    # Where the AI reply is computed (see game/ai_service.py):
+    #   'inline' — inside the web request
+    #   'pool'   — in a process pool of AI_WORKERS; the request waits
+    #   'queue'  — by `python manage.py engine_worker`; make_move returns
+    #              202 and the client polls /game/<id>/ai/
+    'AI_MODE': 'inline',
+    # Processes in the engine pool ('pool' mode)
+    'AI_WORKERS': 2,
+    # A 'running' queue job untouched for this long is picked up again
+    'AI_JOB_TIMEOUT_S': 60,
+    # Times a queue job is tried before it is marked 'failed'
+    'AI_JOB_ATTEMPTS': 3,
+
+    # Processes for one parallel root search (1 = search in-process)
+    'SEARCH_WORKERS': 1,
+    # Tie-break seed for parallel search; None = earliest root move
+    'SEARCH_SEED': None,
+
+    # Check the incrementally updated evaluation against a full
+    # recomputation at every node (debugging only — much slower)
+    'EVAL_CHECK': False,
+
+    # Opening book built by `manage.py build_book`; None = no book
+    'BOOK_PATH': None,
+
+    # Endgame tables built by `manage.py build_tablebases`; None = none
+    'TABLEBASE_DIR': None,
+
+    # Legal-move cache (game/move_cache.py): positions kept per process,
+    # and an optional settings.CACHES alias shared by all processes
+    'MOVE_CACHE_SIZE': 4096,
+    'MOVE_CACHE_ALIAS': None,
+}
+
+DEFAULT_DIFFICULTY = 'medium'
+
+
+def engine_setting(name):
+    return getattr(settings, 'CHESS_ENGINE', {}).get(name, DEFAULTS[name])
+
+
+def difficulty_budget(level):
+    """ai_move() keyword arguments for a difficulty level."""
+    levels = engine_setting('DIFFICULTY')
+    return dict(levels.get(level) or levels[DEFAULT_DIFFICULTY])
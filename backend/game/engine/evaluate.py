@@ -0,0 +1,65 @@
+"""
+Static evaluation for the search: material plus piece-square tables,
+tapered between middlegame and endgame by game phase.
+
+Scores are in centipawns. A Position keeps running middlegame, endgame
+and phase totals (updated in push()/pop()), so evaluate() is a few
+arithmetic operations. full_totals() recomputes them from scratch to
+check that: the position's 12 bitboards are unpacked into a 768-wide
+0/1 feature row and multiplied by WEIGHTS, whose three columns are the
+middlegame, endgame and phase contributions of each feature.
+"""
+
+import numpy as np
+
+from ..bitboard import WHITE
+from ..piece_tables import (
+    MG_VALUES, MG_SQUARE, EG_SQUARE, PHASE_BY_INDEX, taper
+)
+
+
+# Material only, indexed by piece type — used for move ordering
+PIECE_VALUES = MG_VALUES
+
+
+def _build_weights():
+    """WEIGHTS[idx * 64 + sq] — (mg, eg, phase) of piece idx on sq."""
+    weights = np.zeros((12 * 64, 3), dtype=np.int32)
+    for idx in range(12):
+        for sq in range(64):
+            weights[idx * 64 + sq] = (
+                MG_SQUARE[idx][sq], EG_SQUARE[idx][sq], PHASE_BY_INDEX[idx]
+            )
+    return weights
+
+
+WEIGHTS = _build_weights()
+
+
+class EvaluationMismatch(AssertionError):
+    """The incremental totals disagree with a full recomputation."""
+
+
+def full_totals(pos):
+    """(mg, eg, phase) of `pos` recomputed from its bitboards."""
+    bitboards = np.array(pos.bb, dtype='<u8')
+    features = np.unpackbits(bitboards.view(np.uint8), bitorder='little')
+    return tuple(int(v) for v in features @ WEIGHTS)
+
+
+def evaluate(pos, check=False):
+    """
+    Score one position for its side to move, from the Position's
+    running totals. With `check`, first verify those totals against a
+    full recomputation and raise EvaluationMismatch if they differ.
+    """
+    if check:
+        expected = full_totals(pos)
+        if (pos.mg, pos.eg, pos.phase) != expected:
+            raise EvaluationMismatch(
+                f'incremental {(pos.mg, pos.eg, pos.phase)} != '
+                f'full {expected} in {pos.to_fen()}'
+            )
+    score = taper(pos.mg, pos.eg, pos.phase)
+    return score if pos.side == WHITE else -score
+
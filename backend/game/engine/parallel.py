@@ -0,0 +1,93 @@
+"""
+Parallel root search.
+
+The ordered root moves are dealt round-robin across SEARCH_WORKERS
+processes (or a difficulty level's 'workers'), and the pool is sized so
+every share starts at once. Each worker runs iterative deepening over its share with a
+fresh transposition table and reports its best move and exact score for
+every pass it finished. Results are compared at the deepest pass every
+worker finished; a share that ran out of budget before finishing even
+depth 1 is left out rather than dragging the rest down. The overall best is the highest score; ties go to the
+earlier root move, or to a seeded random pick when a seed is given.
+
+A depth- or node-limited search gives the same answer on every run.
+A time limit depends on machine speed, so it can't be deterministic.
+"""
+
+import random
+import time
+
+from .config import engine_setting
+from .pool import get_pool
+from .search import Search, SearchTimeout, MAX_DEPTH, DEFAULT_DEPTH
+from .tt import TranspositionTable
+
+
+def search_share(pos, moves, max_depth, deadline, node_limit, tt_size_mb):
+    """
+    Worker task: iterative deepening over `moves` only.
+    Returns [(best_move, score), ...] — one entry per finished pass.
+    """
+    searcher = Search(
+        pos, tt=TranspositionTable(tt_size_mb),
+        deadline=deadline, node_limit=node_limit,
+    )
+    moves = searcher.order_moves(list(moves), 0)
+    passes = []
+    for depth in range(1, max_depth + 1):
+        try:
+            move, score = searcher.search_root(depth, moves)
+        except SearchTimeout:
+            break
+        passes.append((move, score))
+        moves.remove(move)
+        moves.insert(0, move)
+    return passes
+
+
+def parallel_search(pos, depth=None, time_ms=None, deadline=None,
+                    nodes=None, workers=None, seed=None):
+    """
+    Like search.search(), but split across a process pool.
+    Returns (move, score); move is None when there are no legal moves.
+    """
+    workers = workers or engine_setting('SEARCH_WORKERS')
+    if seed is None:
+        seed = engine_setting('SEARCH_SEED')
+    if depth is None and not (time_ms or deadline or nodes):
+        depth = DEFAULT_DEPTH
+    if time_ms:
+        budget_end = time.monotonic() + time_ms / 1000
+        deadline = min(deadline, budget_end) if deadline else budget_end
+
+    root = Search(pos, tt=TranspositionTable(0))
+    moves = root.order_moves(pos.legal_moves(), 0)
+    if not moves:
+        return None, 0
+
+    shares = [moves[i::workers] for i in range(workers)]
+    shares = [share for share in shares if share]
+    tt_size_mb = max(1, engine_setting('TT_SIZE_MB') // len(shares))
+    node_limit = nodes // len(shares) if nodes else None
+
+    pool = get_pool('search', len(shares))
+    futures = [
+        pool.submit(search_share, pos.copy(), share, depth or MAX_DEPTH,
+                    deadline, node_limit, tt_size_mb)
+        for share in shares
+    ]
+    results = [passes for passes in (f.result() for f in futures) if passes]
+    if not results:
+        return moves[0], 0
+
+    depth = min(len(passes) for passes in results)
+    finished = [passes[depth - 1] for passes in results]
+
+    best_score = max(score for _, score in finished)
+    tied = sorted(
+        (move for move, score in finished if score == best_score),
+        key=moves.index
+    )
+    if seed is not None and len(tied) > 1:
+        return random.Random(seed).choice(tied), best_score
+    return tied[0], best_score
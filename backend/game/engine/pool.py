@@ -0,0 +1,56 @@
+"""
+Process pools for running searches outside the web worker.
+
+Workers are started with 'spawn', so they don't inherit the web server's
+threads or database connections. Engine modules only read settings and
+never touch models, so workers don't need django.setup().
+
+Pools are named so the AI-reply pool ('ai', AI_WORKERS processes) and
+the parallel-search pool ('search', SEARCH_WORKERS) size independently.
+A caller that needs more processes than the setting (a difficulty level
+with its own 'workers') asks for them, and the pool is rebuilt larger.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import engine_setting
+
+
+_pools = {}
+_sizes = {}
+
+POOL_SIZE_SETTINGS = {
+    'ai':     'AI_WORKERS',
+    'search': 'SEARCH_WORKERS',
+}
+
+
+def get_pool(name='ai', size=None):
+    """
+    The named pool for this process, created on first use with at
+    least `size` processes (default: its setting).
+    """
+    size = max(size or 0, engine_setting(POOL_SIZE_SETTINGS[name]))
+    pool = _pools.get(name)
+    if pool is not None and _sizes[name] < size:
+        # Too small: tasks would queue behind each other. Work already
+        # submitted to the old pool still finishes.
+        pool.shutdown(wait=False)
+        pool = None
+    if pool is None:
+        pool = _pools[name] = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+        _sizes[name] = size
+    return pool
+
+
+def shutdown_pool(name=None):
+    """Shut down one pool, or all of them."""
+    for key in ([name] if name else list(_pools)):
+        pool = _pools.pop(key, None)
+        _sizes.pop(key, None)
+        if pool is not None:
+            pool.shutdown()
@@ -0,0 +1,340 @@
+"""
+Alpha-beta search for the AI opponent.
+
+Negamax with iterative deepening and quiescence search. Moves are
+ordered by the transposition-table move, then MVV-LVA for captures,
+then killer moves, then the history heuristic.
+"""
+
+import time
+
+from ..bitboard import Position, EMPTY, MOVE_PROMOTION
+from .evaluate import evaluate, PIECE_VALUES
+from .tt import shared_table, EXACT, LOWER, UPPER
+from .book import book_move
+from .tablebase import (
+    shared_tablebases, tablebase_move, MAX_PIECES, MATE as TB_MATE
+)
+from .config import engine_setting
+
+
+MATE = 100000
+MATE_BOUND = MATE - 1000     # scores beyond this are forced mates
+INFINITY = MATE + 1
+
+MAX_DEPTH = 64
+DEFAULT_DEPTH = 3
+
+# How often (in nodes) the clock is checked
+CHECK_EVERY = 1024
+
+# Ordering bonuses — table move, captures and promotions, then killers
+TT_MOVE_BONUS = 10_000_000
+CAPTURE_BONUS = 1_000_000
+KILLER_BONUS  = 900_000
+
+# MVV-LVA uses the king's value as an attacker too
+_ATTACKER_VALUES = PIECE_VALUES[:5] + [1000]
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time or node budget runs out."""
+
+
+def _to_tt(score, ply):
+    """Mate scores are stored relative to the node, not the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_tt(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Search:
+    """
+    One search over a Position. Killer and history tables live on the
+    instance, so they carry over between iterative-deepening passes.
+    The transposition table defaults to the process-wide shared one.
+    Every push() is paired with a pop() in a finally block, so running
+    out of budget leaves the Position as it was.
+
+    `deadline` is a time.monotonic() value; `time_ms` is relative to
+    now. The earlier of the two wins. `node_limit` caps nodes searched.
+
+    With CHESS_ENGINE['EVAL_CHECK'] on, every static evaluation is
+    checked against a full recomputation (slow; for debugging).
+    """
+
+    def __init__(self, pos, time_ms=None, tt=None, deadline=None,
+                 node_limit=None):
+        if time_ms:
+            budget_end = time.monotonic() + time_ms / 1000
+            deadline = min(deadline, budget_end) if deadline else budget_end
+
+        self.pos        = pos
+        self.tt         = tt if tt is not None else shared_table()
+        self.nodes      = 0
+        self.deadline   = deadline
+        self.node_limit = node_limit
+        self.check_eval = engine_setting('EVAL_CHECK')
+        self.tablebases = shared_tablebases()
+        self.root_best  = None
+        self.killers    = [[0, 0] for _ in range(MAX_DEPTH + 1)]
+        self.history    = [0] * 4096
+
+    # ── Move ordering ───────────────────────
+
+    def order_moves(self, moves, ply, tt_move=0):
+        mailbox = self.pos.mailbox
+        killers = self.killers[ply]
+        history = self.history
+
+        def score(move):
+            if move == tt_move:
+                return TT_MOVE_BONUS
+            victim = mailbox[(move >> 6) & 63]
+            if victim != EMPTY or move & MOVE_PROMOTION:
+                value = PIECE_VALUES[victim % 6] if victim != EMPTY else 0
+                if move & MOVE_PROMOTION:
+                    value += PIECE_VALUES[4]
+                attacker = _ATTACKER_VALUES[mailbox[move & 63] % 6]
+                return CAPTURE_BONUS + value * 10 - attacker // 10
+            if move == killers[0] or move == killers[1]:
+                return KILLER_BONUS
+            return history[move & 4095]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def _store_cutoff(self, move, depth, ply):
+        """Remember a quiet move that caused a beta cutoff."""
+        if self.pos.mailbox[(move >> 6) & 63] != EMPTY:
+            return
+        killers = self.killers[ply]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move & 4095] += depth * depth
+
+    # ── Search ──────────────────────────────
+
+    def _tick(self):
+        self.nodes += 1
+        if self.node_limit and self.nodes >= self.node_limit:
+            raise SearchTimeout
+        if self.nodes % CHECK_EVERY == 0 and self.deadline and \
+           time.monotonic() >= self.deadline:
+            raise SearchTimeout
+
+    def quiescence(self, alpha, beta, ply):
+        """Search captures only, so the static eval isn't taken mid-trade."""
+        self._tick()
+        pos = self.pos
+
+        in_check = pos.is_in_check()
+        if in_check:
+            moves = pos.legal_moves()
+            if not moves:
+                return -MATE + ply
+        else:
+            stand_pat = evaluate(pos, self.check_eval)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            mailbox = pos.mailbox
+            moves = [
+                m for m in pos.legal_moves()
+                if mailbox[(m >> 6) & 63] != EMPTY or m & MOVE_PROMOTION
+            ]
+
+        for move in self.order_moves(moves, ply):
+            pos.push(move)
+            try:
+                score = -self.quiescence(-beta, -alpha, ply + 1)
+            finally:
+                pos.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _probe(self, ply):
+        """Exact tablebase score for a position with few pieces, or None."""
+        pos = self.pos
+        if (pos.occ[0] | pos.occ[1]).bit_count() > MAX_PIECES:
+            return None
+        score = self.tablebases.probe_position(pos)
+        if score is None or score == 0:
+            return score
+        # Tablebase distances count from this node; ours from the root
+        if score > 0:
+            return MATE - ply - (TB_MATE - score)
+        return -MATE + ply + (TB_MATE + score)
+
+    def negamax(self, depth, alpha, beta, ply):
+        if self.tablebases:
+            score = self._probe(ply)
+            if score is not None:
+                return score
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+        self._tick()
+        pos = self.pos
+        key = pos.hash
+
+        tt_move = 0
+        entry = self.tt.probe(key)
+        if entry:
+            tt_move, tt_depth, bound, tt_score = entry
+            if tt_depth >= depth:
+                tt_score = _from_tt(tt_score, ply)
+                if bound == EXACT or \
+                   (bound == LOWER and tt_score >= beta) or \
+                   (bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        moves = pos.legal_moves()
+        if not moves:
+            # Checkmate or stalemate
+            return -MATE + ply if pos.is_in_check() else 0
+
+        original_alpha = alpha
+        best, best_move = -INFINITY, 0
+        for move in self.order_moves(moves, ply, tt_move):
+            pos.push(move)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                pos.pop()
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        self._store_cutoff(move, depth, ply)
+                        break
+
+        if best >= beta:
+            bound = LOWER
+        elif best > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.tt.store(key, best_move, depth, bound, _to_tt(best, ply))
+        return best
+
+    def search_root(self, depth, moves):
+        """
+        One full-width pass at `depth`. Returns (best_move, score).
+        Every move that finishes with a new best score is recorded in
+        `root_best`, so an interrupted pass still leaves a usable answer.
+        """
+        pos = self.pos
+        alpha, beta = -INFINITY, INFINITY
+        best_move, best_score = moves[0], -INFINITY
+        self.root_best = None
+        for move in moves:
+            pos.push(move)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, 1)
+            finally:
+                pos.pop()
+            if score > best_score:
+                best_move, best_score = move, score
+                alpha = max(alpha, score)
+                self.root_best = (move, score)
+        self.tt.store(pos.hash, best_move, depth, EXACT, best_score)
+        return best_move, best_score
+
+    def iterate(self, max_depth):
+        """
+        Iterative deepening. Each pass searches the previous best move
+        first. If the budget runs out mid-pass, the best move that pass
+        had fully searched is kept; it scored at least as well as the
+        previous pass's move, which was searched first. If the budget
+        runs out before any pass finishes, the best-ordered move is
+        returned.
+        """
+        self.tt.new_search()
+        entry = self.tt.probe(self.pos.hash)
+        moves = self.order_moves(
+            self.pos.legal_moves(), 0, entry[0] if entry else 0
+        )
+        if not moves:
+            return None, 0
+
+        best_move, best_score = moves[0], 0
+        for depth in range(1, max_depth + 1):
+            try:
+                best_move, best_score = self.search_root(depth, moves)
+            except SearchTimeout:
+                if self.root_best and self.root_best[0] != best_move:
+                    best_move, best_score = self.root_best
+                break
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            if abs(best_score) >= MATE_BOUND:
+                break
+        return best_move, best_score
+
+
+def search(pos, depth=None, time_ms=None, deadline=None, nodes=None,
+           tt=None):
+    """
+    Find the best move for the side to move in `pos`.
+    Returns (move, score); move is None when there are no legal moves.
+
+    With no limit given at all, searches to DEFAULT_DEPTH.
+    """
+    if depth is None and not (time_ms or deadline or nodes):
+        depth = DEFAULT_DEPTH
+    searcher = Search(pos, time_ms, tt, deadline=deadline, node_limit=nodes)
+    return searcher.iterate(depth or MAX_DEPTH)
+
+
+def ai_move(board, depth=None, time_ms=None, deadline=None, nodes=None,
+            workers=None, seed=None, book=True):
+    """
+    Choose black's reply on the list-of-dicts board.
+    Returns (from_row, from_col, to_row, to_col) or None.
+
+    `deadline` (a time.monotonic() value) and `nodes` bound the search;
+    when either is hit the best move found so far is returned. With
+    more than one worker (default: CHESS_ENGINE['SEARCH_WORKERS']) the
+    root moves are searched in parallel — see engine/parallel.py.
+
+    Positions in the opening book (CHESS_ENGINE['BOOK_PATH']) are
+    answered from the book without searching, unless `book` is False.
+    Endings covered by the tablebases (CHESS_ENGINE['TABLEBASE_DIR'])
+    get a perfect move straight from the tables.
+    """
+    from .parallel import parallel_search
+
+    pos = Position.from_board(board, 'black')
+    workers = workers or engine_setting('SEARCH_WORKERS')
+    move = tablebase_move(pos)
+    if move is None and book:
+        move = book_move(pos)
+    if move is None:
+        if workers > 1:
+            move, _ = parallel_search(
+                pos, depth, time_ms, deadline, nodes, workers, seed
+            )
+        else:
+            move, _ = search(pos, depth, time_ms, deadline, nodes)
+    if move is None:
+        # No moves available (checkmate or stalemate)
+        return None
+    from_row, from_col = divmod(move & 63, 8)
+    to_row, to_col     = divmod((move >> 6) & 63, 8)
+    return (from_row, from_col, to_row, to_col)
@@ -0,0 +1,628 @@
+"""
+Endgame tablebases for three-piece endings (KQK, KRK, KPK).
+
+A table covers one material balance, named like 'KQK' (white king and
+queen against the black king) — the stronger side is always stored as
+white; probes for the other colour flip the board. Every combination of
+side to move and piece squares has an entry:
+
+    index = side * 64**n + sq_0 * 64**(n-1) + ... + sq_(n-1)
+
+with pieces ordered as in the name (white's pieces, then black's). An
+entry holds the distance to mate in plies, plus one; 0 means a draw or
+an illegal placement. An odd distance is a win for the side to move,
+an even one a loss.
+
+Tables are solved by retrograde analysis with NumPy: the moves of every
+position in the table are generated at once into a successor array,
+then values are propagated backwards from the checkmates until nothing
+changes. A capture or promotion leaves the table; its value is read
+from the smaller table (KPK needs KQK, say), which is built first. The entries
+are bitpacked at the narrowest width that fits and read back through
+mmap, one entry per probe.
+
+Build them offline with `python manage.py build_tablebases`. Only the
+AI uses them: ai_move() answers covered endings straight from the table,
+and the search probes them as it reaches three pieces. The game's own
+checkmate and stalemate detection (chess_logic) doesn't need them.
+"""
+
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+from ..bitboard import (
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, EMPTY,
+    ORTHOGONAL, DIAGONAL, BETWEEN, KNIGHT_ATTACKS, KING_ATTACKS,
+    PAWN_ATTACKS, bishop_attacks, rook_attacks
+)
+from .config import engine_setting
+
+
+# Letters in name order, strongest first
+LETTERS = 'KQRBNP'
+LETTER_TYPES = {
+    'K': KING, 'Q': QUEEN, 'R': ROOK, 'B': BISHOP, 'N': KNIGHT, 'P': PAWN,
+}
+TYPE_LETTERS = {ptype: letter for letter, ptype in LETTER_TYPES.items()}
+
+# Tables built by default, in dependency order
+DEFAULT_TABLES = ['KQK', 'KRK', 'KPK']
+
+# A 3-piece table is 2 * 64**3 entries and solves in seconds. The
+# solver keeps whole tables in memory, and four pieces would be 64
+# times bigger, with a successor array of several GB, so it stops here.
+MAX_PIECES = 3
+
+HEADER = struct.Struct('<4sBBI')
+MAGIC = b'CTB1'
+
+# Internal scores: a win in d plies is MATE - d, a loss -(MATE - d)
+MATE = 1000
+
+
+class TablebaseMissing(LookupError):
+    """A table needed to build or probe a position isn't on disk."""
+
+
+# ─────────────────────────────────────────
+# MATERIAL
+# ─────────────────────────────────────────
+
+def _side_letters(types):
+    return ''.join(
+        sorted((TYPE_LETTERS[t] for t in types), key=LETTERS.index)
+    )
+
+
+def _strength(letters):
+    return len(letters), [-LETTERS.index(c) for c in letters]
+
+
+def material_name(white_types, black_types):
+    """
+    (canonical name, flipped) for the two sides' piece types. `flipped`
+    means black is the stronger side and the board must be mirrored.
+    """
+    white = _side_letters(white_types)
+    black = _side_letters(black_types)
+    if _strength(black) > _strength(white):
+        return black + white, True
+    return white + black, False
+
+
+def split_name(name):
+    """'KQKR' → ('KQ', 'KR')."""
+    second = name.index('K', 1)
+    return name[:second], name[second:]
+
+
+def is_trivial_draw(name):
+    """Neither side can ever mate: bare kings, or a lone minor piece."""
+    return name in ('KK', 'KBK', 'KNK')
+
+
+def table_pieces(name):
+    """[(color, type), ...] in index order for a table name."""
+    white, black = split_name(name)
+    return (
+        [(WHITE, LETTER_TYPES[c]) for c in white] +
+        [(BLACK, LETTER_TYPES[c]) for c in black]
+    )
+
+
+# ─────────────────────────────────────────
+# SCORES
+# ─────────────────────────────────────────
+
+def decode_entry(entry):
+    """Stored entry → internal score for the side to move."""
+    if entry == 0:
+        return 0
+    plies = entry - 1
+    return MATE - plies if plies % 2 else -(MATE - plies)
+
+
+def _after_move(scores):
+    """Child scores → the parent's score for playing into them."""
+    return -scores + np.sign(scores)
+
+
+# ─────────────────────────────────────────
+# TABLE FILES
+# ─────────────────────────────────────────
+
+class Tablebase:
+    """One bitpacked table file, read through mmap."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.bits, self.pieces, self.count = \
+            HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError(f'{self.path} is not a tablebase file')
+        self._mask = (1 << self.bits) - 1
+
+    def entry(self, index):
+        bit = index * self.bits
+        start = HEADER.size + bit // 8
+        chunk = self._data[start:start + (bit % 8 + self.bits + 7) // 8]
+        return (int.from_bytes(chunk, 'little') >> (bit % 8)) & self._mask
+
+    def scores(self):
+        """Every entry decoded to internal scores, as a NumPy array."""
+        packed = np.frombuffer(self._data, dtype=np.uint8, offset=HEADER.size)
+        bits = np.unpackbits(packed, bitorder='little')
+        bits = bits[:self.count * self.bits].reshape(self.count, self.bits)
+        entries = (bits.astype(np.int32) << np.arange(self.bits)).sum(axis=1)
+        plies = entries - 1
+        return np.where(
+            entries == 0, 0,
+            np.where(plies % 2 == 1, MATE - plies, plies - MATE)
+        ).astype(np.int32)
+
+    def close(self):
+        self._data.close()
+
+
+def write_table(path, scores, pieces):
+    """Bitpack internal scores into a table file at `path`."""
+    entries = np.zeros(len(scores), dtype=np.uint32)
+    nonzero = scores != 0
+    entries[nonzero] = MATE - np.abs(scores[nonzero]) + 1
+    bits = max(1, int(entries.max()).bit_length())
+    bitplanes = (entries[:, None] >> np.arange(bits, dtype=np.uint32)) & 1
+    packed = np.packbits(
+        bitplanes.astype(np.uint8).reshape(-1), bitorder='little'
+    )
+    partial = f'{path}.tmp'
+    with open(partial, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, bits, pieces, len(scores)))
+        f.write(packed.tobytes())
+    os.replace(partial, path)
+    return bits
+
+
+def table_path(directory, name):
+    return os.path.join(str(directory), f'{name}.tb')
+
+
+# ─────────────────────────────────────────
+# PROBING
+# ─────────────────────────────────────────
+
+class Tablebases:
+    """The tables found in one directory, opened as they're needed."""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self._open = {}
+        self._scores = {}
+
+    def table(self, name):
+        if name not in self._open:
+            path = table_path(self.directory, name)
+            if not os.path.exists(path):
+                raise TablebaseMissing(name)
+            self._open[name] = Tablebase(path)
+        return self._open[name]
+
+    def has(self, name):
+        return os.path.exists(table_path(self.directory, name))
+
+    def lookup(self, pieces, squares, side):
+        """
+        Vectorised score(): `pieces` is [(color, type), ...], `squares`
+        one array of squares per piece and `side` an array of sides to
+        move. Used while building bigger tables.
+        """
+        name, flipped = material_name(
+            [t for c, t in pieces if c == WHITE],
+            [t for c, t in pieces if c == BLACK],
+        )
+        if is_trivial_draw(name):
+            return np.zeros(len(side), dtype=np.int32)
+        if flipped:
+            pieces = [(c ^ 1, t) for c, t in pieces]
+            squares = [sq ^ 56 for sq in squares]
+            side = side ^ 1
+        unused = list(zip(pieces, squares))
+        index = side.astype(np.int64)
+        for piece in table_pieces(name):
+            match = next(u for u in unused if u[0] == piece)
+            unused.remove(match)
+            index = index * 64 + match[1]
+        if name not in self._scores:
+            self._scores[name] = self.table(name).scores()
+        return self._scores[name][index]
+
+    def score(self, placed, side):
+        """
+        Internal score for the side to move, given [(color, type, sq)]
+        for every piece on the board. Raises TablebaseMissing.
+        """
+        name, flipped = material_name(
+            [t for c, t, _ in placed if c == WHITE],
+            [t for c, t, _ in placed if c == BLACK],
+        )
+        if is_trivial_draw(name):
+            return 0
+        if flipped:
+            placed = [(c ^ 1, t, sq ^ 56) for c, t, sq in placed]
+            side ^= 1
+        index = side
+        for color, ptype in table_pieces(name):
+            # Pieces of one kind are interchangeable; take them in turn
+            match = next(
+                p for p in placed if p[0] == color and p[1] == ptype
+            )
+            placed = [p for p in placed if p is not match]
+            index = index * 64 + match[2]
+        return decode_entry(self.table(name).entry(index))
+
+    def probe_position(self, pos):
+        """Internal score of a bitboard Position, or None if not covered."""
+        if -1 in pos.king_sq:
+            return None
+        placed = [
+            (idx // 6, idx % 6, sq)
+            for sq, idx in enumerate(pos.mailbox) if idx != EMPTY
+        ]
+        if len(placed) > MAX_PIECES:
+            return None
+        try:
+            return self.score(placed, pos.side)
+        except TablebaseMissing:
+            return None
+
+    def best_move(self, pos):
+        """
+        (move, score) with the fastest win, slowest loss or a draw for
+        the side to move in `pos`, or None when a table is missing.
+        """
+        if self.probe_position(pos) is None:
+            return None
+        best = None
+        for move in pos.legal_moves():
+            pos.push(move)
+            try:
+                child = self.probe_position(pos)
+            finally:
+                pos.pop()
+            if child is None:
+                return None
+            score = -child + (child > 0) - (child < 0)
+            if best is None or score > best[1]:
+                best = (move, score)
+        return best
+
+
+_shared = {}
+
+
+def shared_tablebases():
+    """
+    Tablebases in CHESS_ENGINE['TABLEBASE_DIR'] for this process, or
+    None when the directory isn't set or doesn't exist.
+    """
+    directory = engine_setting('TABLEBASE_DIR')
+    if not directory or not os.path.isdir(directory):
+        return None
+    directory = str(directory)
+    if directory not in _shared:
+        _shared[directory] = Tablebases(directory)
+    return _shared[directory]
+
+
+def tablebase_move(pos):
+    """A perfect move for `pos` from the shared tables, or None."""
+    tables = shared_tablebases()
+    if tables is None:
+        return None
+    found = tables.best_move(pos)
+    return found[0] if found else None
+
+
+# ─────────────────────────────────────────
+# GENERATION
+# ─────────────────────────────────────────
+# Everything below works on whole tables at once: a position is a row
+# across one square array per piece, and each move pattern (a knight
+# jump, a rook step of a given length, ...) is applied to every
+# position in one NumPy operation.
+
+def _pairs(table):
+    """64×64 bool array from a list of 64 bitboards: [from, to]."""
+    return np.array(
+        [[bool(table[a] >> b & 1) for b in range(64)] for a in range(64)]
+    )
+
+
+def _step_targets(steps):
+    """[(dr, dc)] → array [step][sq] of target squares, -1 off board."""
+    targets = np.full((len(steps), 64), -1, dtype=np.int64)
+    for i, (dr, dc) in enumerate(steps):
+        for sq in range(64):
+            r, c = sq // 8 + dr, sq % 8 + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                targets[i, sq] = r * 8 + c
+    return targets
+
+
+def _ray_targets(dr, dc):
+    """Array [distance - 1][sq] of squares along a ray, -1 off board."""
+    return _step_targets([(dr * n, dc * n) for n in range(1, 8)])
+
+
+KNIGHT_STEPS = _step_targets(
+    [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+)
+KING_STEPS = _step_targets(
+    [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+)
+PAWN_CAPTURE_STEPS = (
+    _step_targets([(-1, -1), (-1, 1)]), _step_targets([(1, -1), (1, 1)])
+)
+ROOK_RAY_TARGETS = [_ray_targets(*d) for d in ORTHOGONAL]
+BISHOP_RAY_TARGETS = [_ray_targets(*d) for d in DIAGONAL]
+
+KNIGHT_PAIRS = _pairs(KNIGHT_ATTACKS)
+KING_PAIRS = _pairs(KING_ATTACKS)
+PAWN_PAIRS = (_pairs(PAWN_ATTACKS[WHITE]), _pairs(PAWN_ATTACKS[BLACK]))
+ROOK_LINES = _pairs([rook_attacks(sq, 0) for sq in range(64)])
+BISHOP_LINES = _pairs([bishop_attacks(sq, 0) for sq in range(64)])
+BETWEEN_MASKS = np.array(BETWEEN, dtype=np.uint64)
+
+_ONE = np.uint64(1)
+
+
+def _bit(squares):
+    return np.left_shift(_ONE, squares.astype(np.uint64))
+
+
+def _occupied_at(occupied, squares):
+    return (np.right_shift(occupied, squares.astype(np.uint64)) & _ONE) == 1
+
+
+def _attacks_square(color, ptype, frm, to, occupied):
+    """Bool array: does a `color` `ptype` on `frm` attack `to`?"""
+    if ptype == PAWN:
+        return PAWN_PAIRS[color][frm, to]
+    if ptype == KNIGHT:
+        return KNIGHT_PAIRS[frm, to]
+    if ptype == KING:
+        return KING_PAIRS[frm, to]
+    clear = (BETWEEN_MASKS[frm, to] & occupied) == 0
+    if ptype == ROOK:
+        return ROOK_LINES[frm, to] & clear
+    if ptype == BISHOP:
+        return BISHOP_LINES[frm, to] & clear
+    return (ROOK_LINES[frm, to] | BISHOP_LINES[frm, to]) & clear
+
+
+def _targets(color, ptype, frm, occupied, own, enemy):
+    """
+    Yield (to, ok) for each move pattern of a piece: `to` is an array
+    of target squares and `ok` says where the pattern is pseudo-legal.
+    """
+    if ptype in (KNIGHT, KING):
+        for steps in (KNIGHT_STEPS if ptype == KNIGHT else KING_STEPS):
+            to = steps[frm]
+            ok = to >= 0
+            to = np.where(ok, to, 0)
+            yield to, ok & ~_occupied_at(own, to)
+    elif ptype == PAWN:
+        step = -8 if color == WHITE else 8
+        one = frm + step
+        empty_one = ~_occupied_at(occupied, one)
+        yield one, empty_one
+        start = (frm // 8) == (6 if color == WHITE else 1)
+        two = np.where(start, one + step, one)
+        yield two, start & empty_one & ~_occupied_at(occupied, two)
+        for steps in PAWN_CAPTURE_STEPS[color]:
+            to = steps[frm]
+            ok = to >= 0
+            to = np.where(ok, to, 0)
+            yield to, ok & _occupied_at(enemy, to)
+    else:
+        rays = []
+        if ptype in (ROOK, QUEEN):
+            rays += ROOK_RAY_TARGETS
+        if ptype in (BISHOP, QUEEN):
+            rays += BISHOP_RAY_TARGETS
+        for ray in rays:
+            open_ = np.ones(len(frm), dtype=bool)
+            for distance in range(7):
+                to = ray[distance][frm]
+                open_ &= to >= 0
+                to = np.where(open_, to, 0)
+                yield to, open_ & ~_occupied_at(own, to)
+                open_ &= ~_occupied_at(occupied, to)
+
+
+def _attacked_by(pieces, squares, target, by_side, occupied, skip=None):
+    """
+    Bool array: is `target` attacked by pieces of colour `by_side` (an
+    array)? `skip[i]` marks piece i as gone (captured).
+    """
+    attacked = np.zeros(len(target), dtype=bool)
+    for i, (color, ptype) in enumerate(pieces):
+        hit = _attacks_square(color, ptype, squares[i], target, occupied)
+        hit &= by_side == color
+        if skip is not None:
+            hit &= ~skip[i]
+        attacked |= hit
+    return attacked
+
+
+def solve(name, tables):
+    """
+    Internal scores for every index of table `name`. Tables for the
+    positions reached by captures and promotions come from `tables`.
+    """
+    pieces = table_pieces(name)
+    n = len(pieces)
+    half = 64 ** n
+    index = np.arange(2 * half, dtype=np.int64)
+    side = index // half
+    squares = [(index // 64 ** (n - 1 - k)) % 64 for k in range(n)]
+    kings = [k for k, (_, t) in enumerate(pieces) if t == KING]
+
+    occupied = np.zeros(2 * half, dtype=np.uint64)
+    by_color = [np.zeros(2 * half, dtype=np.uint64) for _ in range(2)]
+    for (color, _), sq in zip(pieces, squares):
+        occupied |= _bit(sq)
+        by_color[color] |= _bit(sq)
+
+    # Distinct squares, no pawns on the end ranks, and the side that
+    # just moved isn't left in check
+    legal = np.ones(2 * half, dtype=bool)
+    for a in range(n):
+        for b in range(a + 1, n):
+            legal &= squares[a] != squares[b]
+    for (_, ptype), sq in zip(pieces, squares):
+        if ptype == PAWN:
+            legal &= (sq // 8 != 0) & (sq // 8 != 7)
+    their_king = np.where(side == WHITE, squares[kings[1]], squares[kings[0]])
+    legal &= ~_attacked_by(pieces, squares, their_king, side, occupied)
+
+    parents, refs, external = [], [], []
+    ext_count = 0
+    for k, (color, ptype) in enumerate(pieces):
+        rows = np.flatnonzero(legal & (side == color))
+        sq = [s[rows] for s in squares]
+        occ = occupied[rows]
+        own, enemy = by_color[color][rows], by_color[color ^ 1][rows]
+        own_king = kings[color]
+
+        for to, ok in _targets(color, ptype, sq[k], occ, own, enemy):
+            pick = np.flatnonzero(ok)
+            if not len(pick):
+                continue
+            parent, to = rows[pick], to[pick]
+            before = [s[pick] for s in sq]
+            moved = before[:k] + [to] + before[k + 1:]
+            captured = [
+                before[j] == to if j != k else np.zeros(len(pick), dtype=bool)
+                for j in range(n)
+            ]
+            any_capture = np.logical_or.reduce(captured)
+            after = (occ[pick] & ~_bit(before[k])) | _bit(to)
+            safe = ~_attacked_by(
+                pieces, moved, moved[own_king], color ^ 1, after,
+                skip=captured,
+            )
+            if ptype == PAWN:
+                promoted = (to // 8 == 0) | (to // 8 == 7)
+            else:
+                promoted = np.zeros(len(pick), dtype=bool)
+
+            # Quiet moves stay inside this table
+            stay = safe & ~any_capture & ~promoted
+            parents.append(parent[stay])
+            refs.append(
+                parent[stay] + (1 - 2 * color) * half
+                + (to[stay] - before[k][stay]) * 64 ** (n - 1 - k)
+            )
+
+            # Captures and promotions continue in a smaller table; one
+            # lookup per (piece captured, promoted or not)
+            for j in [None] + [j for j in range(n) if j != k]:
+                for promotes in (False, True):
+                    if j is None and not promotes:
+                        continue
+                    leave = safe & (promoted if promotes else ~promoted)
+                    leave &= captured[j] if j is not None else ~any_capture
+                    if not leave.any():
+                        continue
+                    child_pieces = [
+                        (color, QUEEN) if i == k and promotes else piece
+                        for i, piece in enumerate(pieces) if i != j
+                    ]
+                    child_squares = [
+                        moved[i][leave] for i in range(n) if i != j
+                    ]
+                    scores = tables.lookup(
+                        child_pieces, child_squares,
+                        np.full(int(leave.sum()), color ^ 1),
+                    )
+                    parents.append(parent[leave])
+                    refs.append(2 * half + ext_count + np.arange(len(scores)))
+                    external.append(scores)
+                    ext_count += len(scores)
+
+    parents = np.concatenate(parents)
+    refs = np.concatenate(refs)
+    external = (np.concatenate(external).astype(np.int32)
+                if external else np.zeros(0, dtype=np.int32))
+    order = np.argsort(parents, kind='stable')
+    parents, refs = parents[order], refs[order]
+
+    scores = np.zeros(2 * half, dtype=np.int32)
+    moves = np.bincount(parents, minlength=2 * half)
+    own_king = np.where(side == WHITE, squares[kings[0]], squares[kings[1]])
+    in_check = _attacked_by(pieces, squares, own_king, side ^ 1, occupied)
+    scores[legal & (moves == 0) & in_check] = -MATE
+
+    moving, starts = np.unique(parents, return_index=True)
+    # Propagate from the mates until nothing changes. After pass k every
+    # result within k plies is final; whatever is still 0 is a draw.
+    while True:
+        values = np.concatenate([scores, external])
+        best = np.maximum.reduceat(_after_move(values[refs]), starts)
+        if np.array_equal(best, scores[moving]):
+            return scores
+        scores[moving] = best
+
+
+def build(name, directory):
+    """
+    Build table `name` (and any smaller table it depends on) into
+    `directory`. Returns the names of the tables written.
+    """
+    name = name.upper()
+    if not re.fullmatch(r'K[QRBNP]*K[QRBNP]*', name):
+        raise ValueError(f'{name}: not a material name like KQK')
+    white, black = split_name(name)
+    if material_name(
+        [LETTER_TYPES[c] for c in white], [LETTER_TYPES[c] for c in black]
+    )[0] != name:
+        raise ValueError(f'{name}: put the stronger side first')
+    if len(name) > MAX_PIECES:
+        raise ValueError(f'{name}: at most {MAX_PIECES} pieces')
+
+    os.makedirs(directory, exist_ok=True)
+    tables = Tablebases(directory)
+    written = []
+    for dependency in _dependencies(name):
+        if not is_trivial_draw(dependency) and not tables.has(dependency):
+            written += build(dependency, directory)
+    scores = solve(name, tables)
+    write_table(table_path(directory, name), scores, len(name))
+    return written + [name]
+
+
+def _dependencies(name):
+    """Tables reachable from `name` by one capture or promotion."""
+    pieces = table_pieces(name)
+    found = []
+    for i, (color, ptype) in enumerate(pieces):
+        remaining = pieces[:i] + pieces[i + 1:]
+        variants = []
+        if ptype != KING:
+            variants.append(remaining)
+        if ptype == PAWN:
+            variants.append(remaining + [(color, QUEEN)])
+        for variant in variants:
+            dependency, _ = material_name(
+                [t for c, t in variant if c == WHITE],
+                [t for c, t in variant if c == BLACK],
+            )
+            if dependency not in found:
+                found.append(dependency)
+    return found
@@ -0,0 +1,98 @@
+"""
+Fixed-size transposition table.
+
+Entries live in two preallocated array('Q') buffers — one for keys, one
+for packed data — so the table never grows and never allocates per
+entry. Each bucket holds two slots: the first keeps the deepest result
+seen (depth-preferred), the second is always overwritten.
+
+Packed data layout (64 bits):
+    bits  0-15  best move
+    bits 16-23  depth
+    bits 24-25  bound type
+    bits 26-31  search generation
+    bits 32-63  score + SCORE_OFFSET
+"""
+
+from array import array
+
+from .config import engine_setting
+
+
+EXACT, LOWER, UPPER = 1, 2, 3
+
+SLOT_BYTES   = 16          # 8-byte key + 8-byte data
+SCORE_OFFSET = 1 << 31
+
+
+class TranspositionTable:
+
+    def __init__(self, size_mb):
+        slots = max(2, int(size_mb * (1 << 20)) // SLOT_BYTES)
+        self.buckets    = slots // 2
+        self.size_mb    = size_mb
+        self.keys       = array('Q', [0]) * (self.buckets * 2)
+        self.data       = array('Q', [0]) * (self.buckets * 2)
+        self.generation = 0
+
+    def clear(self):
+        for i in range(len(self.keys)):
+            self.keys[i] = 0
+            self.data[i] = 0
+        self.generation = 0
+
+    def new_search(self):
+        """Start a new search; older entries become preferred victims."""
+        self.generation = (self.generation + 1) & 63
+
+    def probe(self, key):
+        """Returns (move, depth, bound, score) for `key`, or None."""
+        slot = (key % self.buckets) * 2
+        keys = self.keys
+        if keys[slot] != key:
+            slot += 1
+            if keys[slot] != key:
+                return None
+        d = self.data[slot]
+        return (
+            d & 0xFFFF,
+            (d >> 16) & 0xFF,
+            (d >> 24) & 3,
+            (d >> 32) - SCORE_OFFSET,
+        )
+
+    def store(self, key, move, depth, bound, score):
+        slot = (key % self.buckets) * 2
+        old = self.data[slot]
+        # Depth-preferred slot: take it if it's the same position, empty,
+        # from an older search, or not deeper than this result
+        if self.keys[slot] == key or self.keys[slot] == 0 or \
+           (old >> 26) & 63 != self.generation or \
+           (old >> 16) & 0xFF <= depth:
+            if self.keys[slot] == key and not move:
+                move = old & 0xFFFF     # keep the previous best move
+        else:
+            slot += 1                   # always-replace slot
+        self.keys[slot] = key
+        self.data[slot] = (
+            move
+            | (min(depth, 255) << 16)
+            | (bound << 24)
+            | (self.generation << 26)
+            | ((score + SCORE_OFFSET) << 32)
+        )
+
+
+_shared = None
+
+
+def shared_table():
+    """
+    The table for this worker process. It lives for the life of the
+    process, so later moves of a game reuse entries from earlier ones.
+    """
+    global _shared
+    size_mb = engine_setting('TT_SIZE_MB')
+    if _shared is None or _shared.size_mb != size_mb:
+        _shared = TranspositionTable(size_mb)
+    return _shared
@@ -0,0 +1,97 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from game.chess_logic import init_board, pack_board
+from game.models import GameSession
+
+
+FINISHED = ['white_won', 'black_won', 'draw']
+
+
+def active_game_query(player):
+    """The lookup index, game_state and new_game run for a player."""
+    return GameSession.objects.filter(
+        player=player, status='active'
+    ).order_by('-updated_at')
+
+
+def seed_games(games, players, batch_size=5000, seed=23):
+    """
+    Add `players` seed users with `games` finished games between them
+    and one active game each. Returns the users. Usernames carry a
+    random run id, so they never clash with real or earlier ones.
+    """
+    User = get_user_model()
+    run = uuid.uuid4().hex[:12]
+    users = User.objects.bulk_create([
+        User(username=f'seed-{run}-{i}',
+             email=f'seed-{run}-{i}@example.invalid', password='!')
+        for i in range(players)
+    ])
+    board = pack_board(init_board())
+    rng = random.Random(seed)
+
+    with transaction.atomic():
+        for done in range(0, games, batch_size):
+            GameSession.objects.bulk_create([
+                GameSession(player=rng.choice(users), board_data=board,
+                            start_data=board, status=rng.choice(FINISHED))
+                for _ in range(min(batch_size, games - done))
+            ])
+        GameSession.objects.bulk_create([
+            GameSession(player=user, board_data=board, start_data=board)
+            for user in users
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return users
+
+
+class Command(BaseCommand):
+    help = ("Show the query plan and time of the active-game lookup, "
+            "optionally after seeding finished games. Seeded data is "
+            "rolled back when the command ends.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Finished games to add first (try 1000000 or more).'
+        )
+        parser.add_argument('--players', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['seed'] and options['players'] < 1:
+            raise CommandError('--players must be at least 1')
+        # Seed and measure in one transaction that is never committed,
+        # so no fake users or games are left behind in a real database
+        with transaction.atomic():
+            if options['seed']:
+                start = time.perf_counter()
+                seed_games(options['seed'], options['players'])
+                self.stdout.write(
+                    f"Seeded {options['seed']} games in "
+                    f"{time.perf_counter() - start:.1f}s (rolled back "
+                    f"at the end)"
+                )
+            self.measure(options['rounds'])
+            transaction.set_rollback(True)
+
+    def measure(self, rounds):
+        game = GameSession.objects.order_by('-id').first()
+        if game is None:
+            raise CommandError('No games to look up; pass --seed N')
+        query = active_game_query(game.player_id)
+
+        self.stdout.write(f'Games:  {GameSession.objects.count()}')
+        self.stdout.write(f'Plan:   {query.explain()}')
+        start = time.perf_counter()
+        for _ in range(rounds):
+            query.first()
+        elapsed = (time.perf_counter() - start) / rounds
+        self.stdout.write(f'Lookup: {elapsed * 1e6:.0f} µs')
@@ -0,0 +1,50 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.bitboard import Position
+from game.chess_logic import START_FEN, pack_board, unpack_board
+
+
+class Command(BaseCommand):
+    help = ('Compare the packed GameSession board encoding with '
+            'JSON text: size and encode/decode time.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fen', default=START_FEN)
+        parser.add_argument('--rounds', type=int, default=20000)
+
+    def timed(self, func, arg, rounds):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func(arg)
+        return (time.perf_counter() - start) / rounds * 1e6
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        if rounds < 1:
+            raise CommandError('--rounds must be at least 1')
+        try:
+            board = Position.from_fen(options['fen']).to_board()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        text   = json.dumps(board)
+        packed = pack_board(board)
+        rows = [
+            ('json',   len(text.encode()),
+             self.timed(json.dumps, board, rounds),
+             self.timed(json.loads, text, rounds)),
+            ('packed', len(packed),
+             self.timed(pack_board, board, rounds),
+             self.timed(unpack_board, packed, rounds)),
+        ]
+
+        self.stdout.write(
+            f"{'':8}{'bytes':>8}{'encode µs':>12}{'decode µs':>12}"
+        )
+        for name, size, encode, decode in rows:
+            self.stdout.write(
+                f'{name:8}{size:>8}{encode:>12.1f}{decode:>12.1f}'
+            )
@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.engine.book import read_pgn, book_counts, write_book
+from game.engine.config import engine_setting
+
+
+class Command(BaseCommand):
+    help = 'Build the AI opening book from a PGN file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pgn', help='PGN file of games to learn from.')
+        parser.add_argument(
+            '--plies', type=int, default=16,
+            help='Moves (half-moves) of each game to put in the book.'
+        )
+        parser.add_argument(
+            '--min-count', type=int, default=1,
+            help='Drop moves played fewer times than this.'
+        )
+        parser.add_argument(
+            '--output',
+            help="Book file to write (default: CHESS_ENGINE['BOOK_PATH'])."
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or engine_setting('BOOK_PATH')
+        if not output:
+            raise CommandError(
+                "No --output given and CHESS_ENGINE['BOOK_PATH'] is not set"
+            )
+        try:
+            with open(options['pgn'], encoding='utf-8',
+                      errors='replace') as f:
+                games = 0
+                counts = {}
+                for game in read_pgn(f):
+                    book_counts([game], options['plies'], counts)
+                    games += 1
+        except OSError as e:
+            raise CommandError(str(e))
+
+        counts = {
+            entry: n for entry, n in counts.items()
+            if n >= options['min_count']
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        # Write aside and rename, so running workers never see a
+        # half-written book
+        partial = f'{output}.tmp'
+        records = write_book(partial, counts)
+        os.replace(partial, output)
+
+        self.stdout.write(f'Games:    {games}')
+        self.stdout.write(f'Entries:  {records}')
+        self.stdout.write(f'Written:  {output}')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.engine.config import engine_setting
+from game.engine.tablebase import build, DEFAULT_TABLES
+
+
+class Command(BaseCommand):
+    help = 'Generate endgame tablebases by retrograde analysis.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tables', nargs='*', default=DEFAULT_TABLES,
+            help='Material to solve (at most 3 pieces), stronger side first, '
+                 'e.g. KQK KRK. '
+                 f"Default: {' '.join(DEFAULT_TABLES)}."
+        )
+        parser.add_argument(
+            '--output-dir',
+            help="Where to write the tables "
+                 "(default: CHESS_ENGINE['TABLEBASE_DIR'])."
+        )
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or engine_setting('TABLEBASE_DIR')
+        if not directory:
+            raise CommandError(
+                "No --output-dir given and CHESS_ENGINE['TABLEBASE_DIR'] "
+                "is not set"
+            )
+        for name in options['tables']:
+            start = time.perf_counter()
+            try:
+                written = build(name, directory)
+            except ValueError as e:
+                raise CommandError(str(e))
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{name.upper()}: wrote {', '.join(written)} "
+                f"in {elapsed:.1f}s"
+            )
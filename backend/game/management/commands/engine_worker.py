@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.ai_service import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued AI replies (CHESS_ENGINE['AI_MODE'] = 'queue'). "
+        'Start one per CPU core you want to give the engine.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=0.2,
+            help='Seconds to sleep when the queue is empty.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when the queue is empty instead of waiting.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.perf_counter()
+            job = run_job(job)
+            self.stdout.write(
+                f'Job #{job.id} (game {job.game_id}): {job.status} '
+                f'in {time.perf_counter() - started:.2f}s'
+            )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import chess_logic
+from game.bitboard import (
+    Position, perft, perft_divide, move_name, encode_move
+)
+
+
+class Command(BaseCommand):
+    help = 'Count move-generator leaf nodes (perft) and report nodes/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=3)
+        parser.add_argument('--fen', default=chess_logic.START_FEN)
+        parser.add_argument(
+            '--divide', action='store_true',
+            help='Print the node count below each root move.'
+        )
+        parser.add_argument(
+            '--board', action='store_true',
+            help='Use the list-of-dicts functions in chess_logic '
+                 'instead of bitboards.'
+        )
+
+    def handle(self, *args, **options):
+        depth = options['depth']
+        if depth < 1:
+            raise CommandError('--depth must be at least 1')
+        try:
+            pos = Position.from_fen(options['fen'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+        if options['board']:
+            board = pos.to_board()
+            if options['divide']:
+                counts = {
+                    encode_move(r * 8 + c, tr * 8 + tc): n
+                    for (r, c, tr, tc), n in chess_logic.perft_divide(
+                        board, depth, pos.turn).items()
+                }
+            else:
+                counts = {None: chess_logic.perft(board, depth, pos.turn)}
+        elif options['divide']:
+            counts = perft_divide(pos, depth)
+        else:
+            counts = {None: perft(pos, depth)}
+        elapsed = time.perf_counter() - start
+
+        if options['divide']:
+            for move in sorted(counts, key=move_name):
+                self.stdout.write(f'{move_name(move)}: {counts[move]}')
+            self.stdout.write('')
+
+        nodes = sum(counts.values())
+        rate = nodes / elapsed if elapsed else 0
+        self.stdout.write(f'Depth:  {depth}')
+        self.stdout.write(f'Nodes:  {nodes}')
+        self.stdout.write(f'Time:   {elapsed:.3f}s')
+        self.stdout.write(f'Speed:  {rate:,.0f} nodes/sec')
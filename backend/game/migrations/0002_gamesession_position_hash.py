@@ -0,0 +1,74 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+import json
+import random
+
+from django.db import migrations, models
+
+
+# A frozen copy of chess_logic.zobrist_hash() as of this migration, so
+# later changes to the live code can't change what it writes. The keys
+# come from the same seeded generator, in the same order.
+_rng = random.Random(0x5EED_C4E55)
+PIECE_KEYS = {
+    (color, ptype): [_rng.getrandbits(64) for _ in range(64)]
+    for color in ('white', 'black')
+    for ptype in ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+}
+BLACK_TO_MOVE = _rng.getrandbits(64)
+CASTLING_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+
+# (right index, king square, rook square, color)
+CASTLING_RIGHTS = [
+    (0, (7, 4), (7, 7), 'white'),
+    (1, (7, 4), (7, 0), 'white'),
+    (2, (0, 4), (0, 7), 'black'),
+    (3, (0, 4), (0, 0), 'black'),
+]
+
+
+def zobrist_hash(board, turn):
+    key = 0
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p:
+                key ^= PIECE_KEYS[(p['color'], p['type'])][r * 8 + c]
+    if turn == 'black':
+        key ^= BLACK_TO_MOVE
+    for i, (kr, kc), (rr, rc), color in CASTLING_RIGHTS:
+        king, rook = board[kr][kc], board[rr][rc]
+        if king and rook and \
+           king['type'] == 'king' and king['color'] == color and \
+           rook['type'] == 'rook' and rook['color'] == color and \
+           not king['has_moved'] and not rook['has_moved']:
+            key ^= CASTLING_KEYS[i]
+    return key
+
+
+def backfill_position_hash(apps, schema_editor):
+    GameSession = apps.get_model('game', 'GameSession')
+    for game in GameSession.objects.exclude(board_state='').iterator():
+        key = zobrist_hash(json.loads(game.board_state), game.turn)
+        if key >= (1 << 63):
+            key -= 1 << 64
+        game.position_hash = key
+        game.save(update_fields=['position_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='position_hash',
+            field=models.BigIntegerField(db_index=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_position_hash, migrations.RunPython.noop
+        ),
+    ]
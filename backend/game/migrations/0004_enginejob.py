@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_gamesession_difficulty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngineJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_hash', models.BigIntegerField(null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('result', models.TextField(default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engine_jobs', to='game.gamesession')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='game_engine_status_b45550_idx')],
+            },
+        ),
+    ]
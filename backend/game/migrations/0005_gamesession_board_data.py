@@ -0,0 +1,81 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:41
+
+import json
+
+from django.db import migrations, models
+
+
+# Frozen copies of chess_logic.pack_board()/unpack_board() as of this
+# migration: 40 bytes, one nibble per square (bit 3 set for black, low
+# bits 1 + index in PIECE_TYPES), then a little-endian 64-bit mask of
+# the squares whose piece has moved.
+PIECE_TYPES = ['pawn', 'knight', 'bishop', 'rook', 'queen', 'king']
+
+
+def pack_board(board):
+    codes = []
+    moved = 0
+    for r in range(8):
+        for c in range(8):
+            p = board[r][c]
+            if p:
+                codes.append((8 if p['color'] == 'black' else 0) |
+                             (PIECE_TYPES.index(p['type']) + 1))
+                if p.get('has_moved'):
+                    moved |= 1 << (r * 8 + c)
+            else:
+                codes.append(0)
+    return bytes(
+        codes[i] << 4 | codes[i + 1] for i in range(0, 64, 2)
+    ) + moved.to_bytes(8, 'little')
+
+
+def unpack_board(data):
+    moved = int.from_bytes(data[32:], 'little')
+    board = []
+    for r in range(8):
+        row = []
+        for c in range(8):
+            sq = r * 8 + c
+            code = data[sq // 2] >> (0 if sq % 2 else 4) & 15
+            row.append({
+                'color':     'black' if code & 8 else 'white',
+                'type':      PIECE_TYPES[(code & 7) - 1],
+                'has_moved': bool(moved >> sq & 1),
+            } if code else None)
+        board.append(row)
+    return board
+
+
+def pack_boards(apps, schema_editor):
+    GameSession = apps.get_model('game', 'GameSession')
+    for game in GameSession.objects.exclude(board_state='').iterator():
+        game.board_data = pack_board(json.loads(game.board_state))
+        game.save(update_fields=['board_data'])
+
+
+def unpack_boards(apps, schema_editor):
+    GameSession = apps.get_model('game', 'GameSession')
+    for game in GameSession.objects.exclude(board_data=b'').iterator():
+        game.board_state = json.dumps(unpack_board(bytes(game.board_data)))
+        game.save(update_fields=['board_state'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_enginejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='board_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_boards, unpack_boards),
+        migrations.RemoveField(
+            model_name='gamesession',
+            name='board_state',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-17 15:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_log_here(apps, schema_editor):
+    # Earlier moves weren't kept, so the log starts at the current board
+    GameSession = apps.get_model('game', 'GameSession')
+    GameSession.objects.update(start_data=F('board_data'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_gamesession_board_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='ply',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='start_data',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.CreateModel(
+            name='Move',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.PositiveIntegerField()),
+                ('code', models.PositiveSmallIntegerField()),
+                ('position_hash', models.BigIntegerField()),
+                ('checkpoint', models.BinaryField(null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='game.gamesession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game', 'ply'), name='unique_move_ply')],
+            },
+        ),
+        migrations.RunPython(start_log_here, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 16:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_move_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='halfmove_clock',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='position_history',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_draw_rules'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['player', 'status', '-updated_at'], name='game_active_player_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_active_game_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enginejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
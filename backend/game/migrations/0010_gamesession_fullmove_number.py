@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 18:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def number_moves(apps, schema_editor):
+    # Exact for games logged from the initial position. Games saved
+    # before 0006 kept no earlier moves (their ply started at 0), so
+    # they get an approximate number, counted from when logging began;
+    # it only shows in their FEN.
+    GameSession = apps.get_model('game', 'GameSession')
+    GameSession.objects.update(fullmove_number=F('ply') / 2 + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_enginejob_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='fullmove_number',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(number_moves, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,22 @@
-from django.db import models
+from array import array
+
+from django.db import models, transaction
 from django.conf import settings
 import json
 
+from .chess_logic import (
+    zobrist_hash, pack_board, unpack_board, make_move, copy_board,
+    insufficient_material
+)
+from .bitboard import (
+    encode_move, move_from, move_to, move_name, MOVE_PROMOTION
+)
+
+
+def signed_hash(key):
+    """Map an unsigned 64-bit Zobrist key into BigIntegerField range."""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
 
 class GameSession(models.Model):
 
@@ -12,30 +27,260 @@ class GameSession(models.Model):
         ('draw',      'Draw'),
     ]
 
+    DIFFICULTY_CHOICES = [
+        ('easy',   'Easy'),
+        ('medium', 'Medium'),
+        ('hard',   'Hard'),
+    ]
+
     player = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='games'
     )
-    board_state = models.TextField(default='')
+    # chess_logic.pack_board() bytes — 40 per position
+    board_data  = models.BinaryField(default=b'')
     turn        = models.CharField(max_length=10, default='white')
     status      = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
         default='active'
     )
+    # AI search budget — see DIFFICULTY in game/engine/config.py
+    difficulty  = models.CharField(
+        max_length=10,
+        choices=DIFFICULTY_CHOICES,
+        default='medium'
+    )
+    # Zobrist key of the current position (see chess_logic.zobrist_hash)
+    position_hash = models.BigIntegerField(null=True, db_index=True)
+    # Position the move log starts from, and how many moves it holds
+    start_data  = models.BinaryField(default=b'')
+    ply         = models.PositiveIntegerField(default=0)
+    # Plies since the last capture or pawn move (fifty-move rule)
+    halfmove_clock   = models.PositiveSmallIntegerField(default=0)
+    # FEN move number: starts at 1 and goes up after each black move
+    fullmove_number  = models.PositiveIntegerField(default=1)
+    # Signed 64-bit keys, array('q') bytes, of every position since the
+    # last capture or pawn move, the current one last. Earlier positions
+    # can't come back, so this never holds more than 101 keys.
+    position_history = models.BinaryField(default=b'')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A player's current game: filter(player=…, status='active')
+            # .order_by('-updated_at'). Partial where the database allows;
+            # elsewhere the condition is dropped and it's a plain index.
+            models.Index(
+                fields=['player', 'status', '-updated_at'],
+                condition=models.Q(status='active'),
+                name='game_active_player_idx',
+            ),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._new_moves = []
+
     def get_board(self):
-        """Convert stored JSON string → Python list."""
-        if self.board_state:
-            return json.loads(self.board_state)
+        """Convert stored bytes → Python list."""
+        if self.board_data:
+            return unpack_board(bytes(self.board_data))
         return None
 
     def set_board(self, board_data):
-        """Convert Python list → JSON string for storage."""
-        self.board_state = json.dumps(board_data)
+        """Convert Python list → packed bytes for storage."""
+        self.board_data = pack_board(board_data)
+        self.position_hash = signed_hash(zobrist_hash(board_data, self.turn))
+
+    def record_move(self, board, from_row, from_col, to_row, to_col):
+        """
+        Play a move on a copy of `board` and return the new board.
+        The move joins the log on the next save(), in one bulk insert
+        with any other moves recorded since. The halfmove clock, move
+        number and position history move on too, the new key coming from the
+        move's hash delta rather than a fresh hash of the board.
+        """
+        piece = board[from_row][from_col]
+        irreversible = piece['type'] == 'pawn' or \
+            board[to_row][to_col] is not None
+
+        history = array('q', bytes(self.position_history))
+        if not history:
+            history.append(signed_hash(zobrist_hash(board, piece['color'])))
+        key = history[-1] % (1 << 64)
+
+        board = copy_board(board)
+        undo  = make_move(board, from_row, from_col, to_row, to_col)
+        key   = signed_hash(key ^ undo['hash_delta'])
+
+        if irreversible:
+            self.halfmove_clock = 0
+            history = array('q')
+        else:
+            self.halfmove_clock += 1
+        history.append(key)
+        self.position_history = history.tobytes()
+
+        self.ply += 1
+        if piece['color'] == 'black':
+            self.fullmove_number += 1
+        self._new_moves.append(Move(
+            game=self,
+            ply=self.ply,
+            code=encode_move(
+                from_row * 8 + from_col, to_row * 8 + to_col,
+                undo['promoted']
+            ),
+            position_hash=key,
+            checkpoint=(
+                pack_board(board)
+                if self.ply % Move.CHECKPOINT_EVERY == 0 else None
+            ),
+        ))
+        return board
+
+    def draw_reason(self, board):
+        """
+        Why the game is drawn after the last recorded move, or None:
+        'threefold repetition', 'fifty-move rule' or
+        'insufficient material'. `board` is the board that move made.
+        """
+        history = array('q', bytes(self.position_history))
+        if history and history.count(history[-1]) >= 3:
+            return 'threefold repetition'
+        if self.halfmove_clock >= 100:
+            return 'fifty-move rule'
+        # Material only drops on a capture, which resets the clock
+        if self.halfmove_clock == 0 and insufficient_material(board):
+            return 'insufficient material'
+        return None
+
+    def board_at(self, ply):
+        """
+        The board after `ply` moves of the log (0 = the start
+        position), replayed from the nearest checkpoint at or before it.
+        """
+        if not 0 <= ply <= self.ply:
+            raise ValueError(f'ply must be between 0 and {self.ply}')
+        checkpoint = self.moves.filter(
+            ply__lte=ply, checkpoint__isnull=False
+        ).order_by('-ply').values_list('ply', 'checkpoint').first()
+        start, data = checkpoint or (0, self.start_data)
+
+        board = unpack_board(bytes(data))
+        for code in self.moves.filter(
+            ply__gt=start, ply__lte=ply
+        ).order_by('ply').values_list('code', flat=True):
+            frm, to = move_from(code), move_to(code)
+            make_move(board, frm >> 3, frm & 7, to >> 3, to & 7)
+        return board
+
+    def save(self, *args, **kwargs):
+        if not self.start_data:
+            self.start_data = self.board_data
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self._new_moves:
+                Move.objects.bulk_create(self._new_moves)
+                self._new_moves = []
+
+    @classmethod
+    def with_position(cls, board, turn='white'):
+        """Games whose current position matches `board` with `turn` to move."""
+        return cls.objects.filter(
+            position_hash=signed_hash(zobrist_hash(board, turn))
+        )
+
+    def __str__(self):
+        return f"Game #{self.id} — {self.player.username} ({self.status})"
+
+
+class Move(models.Model):
+    """
+    One move of a game's log, appended by GameSession.record_move().
+    Every CHECKPOINT_EVERY plies the move also stores the packed board
+    it leads to, so GameSession.board_at() never replays far.
+    """
+
+    CHECKPOINT_EVERY = 16
+
+    game = models.ForeignKey(
+        GameSession,
+        on_delete=models.CASCADE,
+        related_name='moves'
+    )
+    ply  = models.PositiveIntegerField()
+    # from | to << 6 | MOVE_PROMOTION, as in the engine (see bitboard.py)
+    code = models.PositiveSmallIntegerField()
+    # Zobrist key of the position after the move
+    position_hash = models.BigIntegerField()
+    checkpoint    = models.BinaryField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['game', 'ply'], name='unique_move_ply'
+            ),
+        ]
+
+    @property
+    def from_square(self):
+        """(row, col) the piece moved from."""
+        return divmod(move_from(self.code), 8)
+
+    @property
+    def to_square(self):
+        """(row, col) the piece moved to."""
+        return divmod(move_to(self.code), 8)
+
+    @property
+    def promotion(self):
+        return bool(self.code & MOVE_PROMOTION)
+
+    def __str__(self):
+        return f"Game #{self.game_id} ply {self.ply}: {move_name(self.code)}"
+
+
+class EngineJob(models.Model):
+    """
+    A queued AI reply (CHESS_ENGINE['AI_MODE'] = 'queue').
+    Created by make_move, run by `manage.py engine_worker`.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done',    'Done'),
+        ('failed',  'Failed'),
+    ]
+
+    game = models.ForeignKey(
+        GameSession,
+        on_delete=models.CASCADE,
+        related_name='engine_jobs'
+    )
+    # Position the AI should answer — the job is dropped if the game moved on
+    position_hash = models.BigIntegerField(null=True)
+    status     = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    result     = models.TextField(default='')   # JSON response body
+    attempts   = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def get_result(self):
+        if self.result:
+            return json.loads(self.result)
+        return None
 
     def __str__(self):
-        return f"Game #{self.id} — {self.player.username} ({self.status})"
\ No newline at end of file
+        return f"EngineJob #{self.id} — game {self.game_id} ({self.status})"
@@ -0,0 +1,93 @@
+"""
+Legal moves per position, generated once and cached.
+
+One click-to-move turn asks for the same position's moves several
+times: /moves/ for each piece the player taps, make_move to validate
+the chosen move, then the checkmate/stalemate test after each side's
+move. Here a position's game_outcome() — check state and full move
+list — is worked out once and kept under its Zobrist key (placement,
+side to move and castling rights — all that legal moves depend on
+under these rules).
+
+The cache is an in-process LRU (chess_project/lru.py) of
+CHESS_ENGINE['MOVE_CACHE_SIZE'] positions. With
+CHESS_ENGINE['MOVE_CACHE_ALIAS'] naming one of settings.CACHES, it is
+backed by that Django cache too, so positions are shared between web
+workers.
+"""
+
+from chess_project.lru import LRUCache, django_cache
+
+from .chess_logic import zobrist_hash, game_outcome as _game_outcome
+from .engine.config import engine_setting
+
+
+_local = LRUCache(lambda: engine_setting('MOVE_CACHE_SIZE'))
+
+
+def _cache_key(key):
+    return f'chess:moves:{key:016x}'
+
+
+def clear_move_cache():
+    """Empty the in-process cache (the Django cache is left alone)."""
+    _local.clear()
+
+
+def game_outcome(board, color):
+    """
+    chess_logic.game_outcome(), cached: ('checkmate' | 'stalemate' |
+    'check' | 'ongoing', moves) with moves a tuple of
+    (from_row, from_col, to_row, to_col).
+    """
+    key = zobrist_hash(board, color)
+    found = _local.get(key)
+    if found is not None:
+        return found
+
+    shared = django_cache(engine_setting('MOVE_CACHE_ALIAS'))
+    if shared is not None:
+        found = shared.get(_cache_key(key))
+    if found is None:
+        outcome, moves = _game_outcome(board, color)
+        found = (outcome, tuple(moves))
+        if shared is not None:
+            shared.set(_cache_key(key), found)
+    else:
+        outcome, moves = found
+        found = (outcome, tuple(tuple(move) for move in moves))
+
+    _local.put(key, found)
+    return found
+
+
+def legal_moves(board, color):
+    """Every legal move of `color` on `board` (see game_outcome)."""
+    return game_outcome(board, color)[1]
+
+
+def piece_moves(board, row, col):
+    """Legal target squares [(row, col), ...] of the piece on (row, col)."""
+    piece = board[row][col]
+    if not piece:
+        return []
+    return [
+        (to_row, to_col)
+        for from_row, from_col, to_row, to_col
+        in legal_moves(board, piece['color'])
+        if from_row == row and from_col == col
+    ]
+
+
+def move_map(board, color):
+    """
+    {"row,col": [[to_row, to_col], ...]} for every piece of `color`
+    that can move — the JSON form clients use to highlight moves.
+    """
+    moves = {}
+    for from_row, from_col, to_row, to_col in legal_moves(board, color):
+        moves.setdefault(f'{from_row},{from_col}', []).append(
+            [to_row, to_col]
+        )
+    return moves
+
@@ -0,0 +1,146 @@
+"""
+Piece values and piece-square tables, shared by the bitboard Position
+(which keeps running totals of them) and engine/evaluate.py.
+
+Every table is from white's point of view, rank 8 first — the same order
+as our square numbers — and is mirrored for black. Two sets are kept:
+middlegame (MG) and endgame (EG). The evaluation blends them by PHASE,
+which falls from TOTAL_PHASE towards 0 as pieces come off the board.
+"""
+
+
+# Indexed by piece type
+MG_VALUES = [100, 320, 330, 500, 900, 0]
+EG_VALUES = [120, 300, 320, 520, 940, 0]
+
+# Phase contributed by each piece type; the start position totals 24
+PHASE_WEIGHTS = [0, 1, 1, 2, 4, 0]
+TOTAL_PHASE = 24
+
+# ── Middlegame tables ──────────────────────
+
+MG_PAWN = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+MG_KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+MG_BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+MG_ROOK = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+]
+MG_QUEEN = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+MG_KING = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+
+MG_TABLES = [
+    MG_PAWN, MG_KNIGHT, MG_BISHOP,
+    MG_ROOK, MG_QUEEN, MG_KING,
+]
+
+
+# ── Endgame tables ─────────────────────────
+# Passed-pawn style rank bonus and a centralising king; the other
+# pieces keep their middlegame tables.
+
+EG_PAWN = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+EG_KING = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+EG_TABLES = [
+    EG_PAWN, MG_KNIGHT, MG_BISHOP,
+    MG_ROOK, MG_QUEEN, EG_KING,
+]
+
+
+def _by_index(values, tables):
+    """[idx][sq] white-positive scores for all 12 piece indexes."""
+    white = [
+        [values[t] + tables[t][sq] for sq in range(64)] for t in range(6)
+    ]
+    black = [
+        [-(values[t] + tables[t][sq ^ 56]) for sq in range(64)]
+        for t in range(6)
+    ]
+    return white + black
+
+
+# Indexed [color * 6 + type][sq], like the bitboards
+MG_SQUARE = _by_index(MG_VALUES, MG_TABLES)
+EG_SQUARE = _by_index(EG_VALUES, EG_TABLES)
+PHASE_BY_INDEX = PHASE_WEIGHTS * 2
+
+
+def taper(mg, eg, phase):
+    """
+    Blend middlegame and endgame scores by game phase. Rounds toward
+    zero, so a position and its colour-flipped twin score alike.
+    """
+    phase = min(phase, TOTAL_PHASE)
+    blended = mg * phase + eg * (TOTAL_PHASE - phase)
+    score = abs(blended) // TOTAL_PHASE
+    return score if blended >= 0 else -score
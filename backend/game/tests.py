@@ -1,3 +1,1406 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .chess_logic import (
+    init_board, get_legal_moves, apply_move, is_in_check,
+    make_move, unmake_move, copy_board, is_square_attacked,
+    iter_legal_moves, get_valid_moves, create_piece, zobrist_hash,
+    game_outcome, is_checkmate, is_stalemate, pack_board, unpack_board,
+    PACKED_BOARD_SIZE, to_fen, from_fen, parse_fen, insufficient_material,
+    find_king, king_squares, track_king, START_FEN, perft as board_perft
+)
+from .models import GameSession, EngineJob, Move
+from .management.commands.active_game_plan import (
+    seed_games, active_game_query
+)
+from . import ai_service, move_cache
+from .engine.pool import get_pool, shutdown_pool
+from .engine.parallel import parallel_search
+from .engine import ai_move, difficulty_budget
+from .engine.search import Search, MATE_BOUND
+from .engine.tablebase import Tablebases, MATE as TB_MATE
+from .engine.book import (
+    OpeningBook, read_pgn, parse_san, book_counts, write_book
+)
+from .engine.evaluate import evaluate, full_totals
+from .engine.tt import (
+    TranspositionTable, shared_table, EXACT, LOWER, UPPER
+)
+from .bitboard import (
+    Position, perft, perft_divide, parse_square
+)
+
+
+def legal_move_map(board, color):
+    """{(row, col): sorted targets} using the dict-board functions."""
+    moves = {}
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece and piece['color'] == color:
+                moves[(r, c)] = sorted(get_legal_moves(board, piece, r, c))
+    return moves
+
+
+def random_games(games, plies, seed=1):
+    """Yield (board, color) along random playouts from the start position."""
+    rng = random.Random(seed)
+    for _ in range(games):
+        board, color = init_board(), 'white'
+        for _ in range(plies):
+            yield board, color
+            moves = [
+                (frm, to)
+                for frm, targets in legal_move_map(board, color).items()
+                for to in targets
+            ]
+            if not moves:
+                break
+            (fr, fc), (tr, tc) = rng.choice(moves)
+            board = apply_move(board, fr, fc, tr, tc)
+            color = 'black' if color == 'white' else 'white'
+
+
+def reference_valid_moves(board, piece, row, col):
+    """get_valid_moves() as it was before the precomputed tables."""
+    moves = []
+    color    = piece['color']
+    opponent = 'black' if color == 'white' else 'white'
+    sliding_directions = {
+        'rook':   [(1,0),(-1,0),(0,1),(0,-1)],
+        'bishop': [(1,1),(1,-1),(-1,1),(-1,-1)],
+        'queen':  [(1,0),(-1,0),(0,1),(0,-1),
+                   (1,1),(1,-1),(-1,1),(-1,-1)],
+    }
+    ptype = piece['type']
+    if ptype == 'pawn':
+        direction = -1 if color == 'white' else 1
+        start_row =  6 if color == 'white' else 1
+        new_row = row + direction
+        if 0 <= new_row < 8 and board[new_row][col] is None:
+            moves.append((new_row, col))
+            if row == start_row and board[row + 2*direction][col] is None:
+                moves.append((row + 2*direction, col))
+        for dc in [-1, 1]:
+            nc = col + dc
+            if 0 <= new_row < 8 and 0 <= nc < 8:
+                target = board[new_row][nc]
+                if target and target['color'] == opponent:
+                    moves.append((new_row, nc))
+    elif ptype in sliding_directions:
+        for dr, dc in sliding_directions[ptype]:
+            r, c = row + dr, col + dc
+            while 0 <= r < 8 and 0 <= c < 8:
+                if board[r][c] is None:
+                    moves.append((r, c))
+                elif board[r][c]['color'] == opponent:
+                    moves.append((r, c))
+                    break
+                else:
+                    break
+                r += dr
+                c += dc
+    else:
+        if ptype == 'knight':
+            steps = [(2,1),(2,-1),(-2,1),(-2,-1),(1,2),(1,-2),(-1,2),(-1,-2)]
+        else:
+            steps = [(dr, dc) for dr in [-1, 0, 1] for dc in [-1, 0, 1]
+                     if dr or dc]
+        for dr, dc in steps:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                target = board[r][c]
+                if target is None or target['color'] == opponent:
+                    moves.append((r, c))
+    return moves
+
+
+class MoveTableTests(SimpleTestCase):
+
+    def test_tables_match_reference_on_every_square(self):
+        empty = [[None] * 8 for _ in range(8)]
+        boards = [empty] + [b for b, _ in random_games(2, 40, seed=4)]
+        for board in boards:
+            for r in range(8):
+                for c in range(8):
+                    original = board[r][c]
+                    for color in ('white', 'black'):
+                        for ptype in ('pawn', 'knight', 'bishop',
+                                      'rook', 'queen', 'king'):
+                            piece = create_piece(color, ptype)
+                            board[r][c] = piece
+                            self.assertEqual(
+                                sorted(get_valid_moves(board, piece, r, c)),
+                                sorted(reference_valid_moves(
+                                    board, piece, r, c)),
+                                (r, c, color, ptype),
+                            )
+                    board[r][c] = original
+
+
+class MakeUnmakeTests(SimpleTestCase):
+
+    def test_unmake_restores_board(self):
+        for board, color in random_games(3, 60):
+            before = copy_board(board)
+            for (r, c), targets in legal_move_map(board, color).items():
+                for tr, tc in targets:
+                    undo = make_move(board, r, c, tr, tc)
+                    self.assertIsNone(board[r][c])
+                    unmake_move(board, undo)
+                    self.assertEqual(board, before)
+
+    def test_king_squares_follow_moves(self):
+        for board, color in random_games(3, 60, seed=3):
+            kings = king_squares(board)
+            for r, c, tr, tc in list(iter_legal_moves(board, color)):
+                undo = make_move(board, r, c, tr, tc)
+                track_king(kings, board, undo)
+                self.assertEqual(kings[color], find_king(board, color))
+                unmake_move(board, undo)
+                track_king(kings, board, undo)
+                self.assertEqual(kings, king_squares(board))
+
+    def test_promotion_is_undone(self):
+        board = [[None] * 8 for _ in range(8)]
+        board[1][0] = {'color': 'white', 'type': 'pawn', 'has_moved': True}
+        undo = make_move(board, 1, 0, 0, 0)
+        self.assertEqual(board[0][0]['type'], 'queen')
+        self.assertTrue(undo['promoted'])
+        unmake_move(board, undo)
+        self.assertEqual(board[1][0]['type'], 'pawn')
+
+    def test_apply_move_leaves_original_unchanged(self):
+        board = init_board()
+        new_board = apply_move(board, 6, 4, 4, 4)
+        self.assertEqual(board, init_board())
+        self.assertTrue(new_board[4][4]['has_moved'])
+
+
+class AttackTests(SimpleTestCase):
+
+    def test_is_square_attacked_matches_bitboards(self):
+        for board, color in random_games(3, 60, seed=2):
+            pos = Position.from_board(board, color)
+            for sq in range(64):
+                for by_color, by in (('white', 0), ('black', 1)):
+                    self.assertEqual(
+                        is_square_attacked(board, divmod(sq, 8), by_color),
+                        pos.is_square_attacked(sq, by),
+                    )
+
+    def test_pinned_piece_stays_on_line(self):
+        board = [[None] * 8 for _ in range(8)]
+        board[7][4] = {'color': 'white', 'type': 'king',   'has_moved': False}
+        board[5][4] = {'color': 'white', 'type': 'rook',   'has_moved': False}
+        board[0][4] = {'color': 'black', 'type': 'queen',  'has_moved': False}
+        board[0][0] = {'color': 'black', 'type': 'king',   'has_moved': False}
+        moves = get_legal_moves(board, board[5][4], 5, 4)
+        self.assertEqual(
+            sorted(moves), [(r, 4) for r in range(0, 7) if r != 5]
+        )
+
+    def test_iter_legal_moves_matches_per_piece(self):
+        for board, color in random_games(3, 60, seed=3):
+            expected = sorted(
+                (r, c, tr, tc)
+                for (r, c), targets in legal_move_map(board, color).items()
+                for tr, tc in targets
+            )
+            self.assertEqual(sorted(iter_legal_moves(board, color)), expected)
+
+    def test_game_outcome_matches_separate_checks(self):
+        positions = list(random_games(3, 60, seed=18)) + [
+            (Position.from_fen(fen).to_board(), color)
+            for fen, color in (
+                ('7k/6Q1/6K1/8/8/8/8/8 b - - 0 1', 'black'),   # mated
+                ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', 'black'),   # stalemated
+            )
+        ]
+        seen = set()
+        for board, color in positions:
+            outcome, moves = game_outcome(board, color)
+            seen.add(outcome)
+            self.assertEqual(
+                sorted(moves), sorted(iter_legal_moves(board, color))
+            )
+            self.assertEqual(
+                outcome == 'checkmate', is_checkmate(board, color)
+            )
+            self.assertEqual(
+                outcome == 'stalemate', is_stalemate(board, color)
+            )
+            self.assertEqual(
+                outcome in ('check', 'checkmate'), is_in_check(board, color)
+            )
+        self.assertTrue({'checkmate', 'stalemate', 'ongoing'} <= seen)
+
+
+class FenTests(SimpleTestCase):
+
+    def test_start_position(self):
+        self.assertEqual(to_fen(init_board()), START_FEN)
+        self.assertEqual(from_fen(START_FEN), (init_board(), 'white'))
+
+    def test_matches_bitboard_fen(self):
+        for board, color in random_games(3, 80, seed=20):
+            fen = to_fen(board, color)
+            self.assertEqual(fen, Position.from_board(board, color).to_fen())
+            loaded, turn = from_fen(fen)
+            self.assertEqual(turn, color)
+            self.assertEqual(loaded, Position.from_fen(fen).to_board())
+            self.assertEqual(
+                zobrist_hash(loaded, turn), zobrist_hash(board, color)
+            )
+
+    def test_all_fields_round_trip(self):
+        fen = 'rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 3 12'
+        board, turn, en_passant, halfmove, fullmove = parse_fen(fen)
+        self.assertEqual((turn, en_passant, halfmove, fullmove),
+                         ('white', (2, 3), 3, 12))
+        self.assertEqual(to_fen(board, turn, halfmove, fullmove, en_passant),
+                         fen)
+        pos = Position.from_fen(fen)
+        self.assertEqual(pos.ep_square, parse_square('d6'))
+        self.assertEqual(pos.to_fen(3, 12), fen)
+
+    def test_invalid(self):
+        for fen in ('', '8/8/8 w', '9/8/8/8/8/8/8/8 w - - 0 1',
+                    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w - - 0 1',
+                    START_FEN.replace(' w ', ' x '),
+                    START_FEN.replace(' - ', ' e9 '),
+                    START_FEN.replace(' 0 1', ' 0 0'),
+                    START_FEN + ' extra'):
+            with self.assertRaises(ValueError):
+                from_fen(fen)
+
+
+class PositionTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for board, color in random_games(3, 80):
+            pos = Position.from_board(board, color)
+            self.assertEqual(pos.to_board(), board)
+            self.assertEqual(pos.turn, color)
+
+    def test_matches_dict_board_moves(self):
+        for board, color in random_games(5, 80):
+            pos = Position.from_board(board, color)
+            expected = legal_move_map(board, color)
+            actual = {
+                divmod(sq, 8): sorted(pos.legal_targets(sq))
+                for sq in range(64)
+                if divmod(sq, 8) in expected
+            }
+            self.assertEqual(actual, expected)
+            self.assertEqual(pos.is_in_check(), is_in_check(board, color))
+            self.assertEqual(
+                len(pos.legal_moves()),
+                sum(len(t) for t in expected.values())
+            )
+
+    def test_push_pop_restores_position(self):
+        pos = Position.from_board(init_board())
+        before = (pos.bb[:], pos.mailbox[:], pos.moved, pos.castling)
+        for move in pos.legal_moves():
+            pos.push(move)
+            pos.pop()
+        self.assertEqual(
+            (pos.bb, pos.mailbox, pos.moved, pos.castling), before
+        )
+
+
+class ZobristTests(SimpleTestCase):
+
+    def test_incremental_hash_matches_full_hash(self):
+        for board, color in random_games(4, 80, seed=5):
+            key = zobrist_hash(board, color)
+            pos = Position.from_board(board, color)
+            self.assertEqual(pos.hash, key)
+            for r, c, tr, tc in list(iter_legal_moves(board, color)):
+                other = 'black' if color == 'white' else 'white'
+                undo = make_move(board, r, c, tr, tc)
+                self.assertEqual(
+                    key ^ undo['hash_delta'], zobrist_hash(board, other)
+                )
+                unmake_move(board, undo)
+
+            for move in pos.legal_moves():
+                pos.push(move)
+                self.assertEqual(pos.hash, pos.compute_hash())
+                pos.pop()
+                self.assertEqual(pos.hash, key)
+
+    def test_castling_rights_change_the_hash(self):
+        board = init_board()
+        moved = copy_board(board)
+        moved[7][7]['has_moved'] = True
+        self.assertNotEqual(zobrist_hash(board), zobrist_hash(moved))
+        self.assertNotEqual(
+            zobrist_hash(board, 'white'), zobrist_hash(board, 'black')
+        )
+
+
+class GameSessionHashTests(TestCase):
+
+    def test_lookup_by_position(self):
+        user = get_user_model().objects.create_user(
+            username='hash', email='hash@example.com', password='pw123456'
+        )
+        game = GameSession(player=user)
+        game.set_board(apply_move(init_board(), 6, 4, 4, 4))
+        game.save()
+        self.assertEqual(
+            list(GameSession.with_position(
+                apply_move(init_board(), 6, 4, 4, 4))),
+            [game],
+        )
+        self.assertFalse(GameSession.with_position(init_board()).exists())
+
+
+class MoveLogTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='log', email='log@example.com', password='pw123456'
+        )
+
+    def test_replay_matches_every_position(self):
+        game = GameSession(player=self.user)
+        board = init_board()
+        game.set_board(board)
+        game.save()
+
+        boards = [board]
+        rng = random.Random(21)
+        while game.ply < 40:
+            color = 'white' if game.ply % 2 == 0 else 'black'
+            moves = list(iter_legal_moves(board, color))
+            if not moves:
+                break
+            board = game.record_move(board, *rng.choice(moves))
+            boards.append(board)
+            if game.ply % 2 == 0:
+                game.turn = 'white'
+                game.set_board(board)
+                game.save()
+        game.save()
+
+        game = GameSession.objects.get(id=game.id)
+        self.assertEqual(game.moves.count(), game.ply)
+        self.assertEqual(
+            game.moves.filter(checkpoint__isnull=False).count(),
+            game.ply // Move.CHECKPOINT_EVERY
+        )
+        for ply, expected in enumerate(boards):
+            self.assertEqual(game.board_at(ply), expected)
+        with self.assertRaises(ValueError):
+            game.board_at(game.ply + 1)
+
+    def test_moves_written_in_one_insert(self):
+        game = GameSession(player=self.user)
+        game.set_board(init_board())
+        game.save()
+        board = game.record_move(init_board(), 6, 4, 4, 4)
+        board = game.record_move(board, 1, 4, 3, 4)
+        game.set_board(board)
+        with self.assertNumQueries(4):    # savepoint, update, insert, release
+            game.save()
+        self.assertEqual(
+            [(m.ply, m.from_square, m.to_square) for m in game.moves.all()],
+            [(1, (6, 4), (4, 4)), (2, (1, 4), (3, 4))]
+        )
+        self.assertEqual(
+            game.moves.get(ply=2).position_hash, game.position_hash
+        )
+
+    def test_promotion_flag(self):
+        board, _ = from_fen('4k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        game = GameSession(player=self.user)
+        game.set_board(board)
+        game.save()
+        game.record_move(board, 1, 0, 0, 0)
+        game.save()
+        move = game.moves.get()
+        self.assertTrue(move.promotion)
+        self.assertEqual(game.board_at(1)[0][0]['type'], 'queen')
+
+
+class DrawRuleTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username='draws', email='draws@example.com', password='pw123456'
+        )
+        self.game = GameSession(player=user)
+
+    def start(self, fen=START_FEN):
+        board, _ = from_fen(fen)
+        self.game.set_board(board)
+        self.game.save()
+        return board
+
+    def test_insufficient_material(self):
+        for fen, expected in (
+            ('4k3/8/8/8/8/8/8/4K3 w - - 0 1',    True),     # bare kings
+            ('4k3/8/8/8/8/8/8/4KN2 w - - 0 1',   True),     # lone knight
+            ('2b1k3/8/8/8/8/8/8/4KB2 w - - 0 1', True),     # same-shade bishops
+            ('1b2k3/8/8/8/8/8/8/4KB2 w - - 0 1', False),    # opposite shades
+            ('4k3/8/8/8/8/8/8/3NKN2 w - - 0 1',  False),
+            ('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1',  False),
+        ):
+            board, _ = from_fen(fen)
+            self.assertEqual(insufficient_material(board), expected, fen)
+
+    def test_threefold_repetition(self):
+        board = self.start()
+        shuffle = [(7, 6, 5, 5), (0, 6, 2, 5), (5, 5, 7, 6), (2, 5, 0, 6)]
+        for i, move in enumerate(shuffle * 2):
+            board = self.game.record_move(board, *move)
+            # The start position comes back after plies 4 and 8
+            self.assertEqual(
+                self.game.draw_reason(board),
+                'threefold repetition' if i == 7 else None
+            )
+        self.assertEqual(self.game.halfmove_clock, 8)
+
+    def test_history_keys_match_full_hash(self):
+        board = self.start()
+        rng = random.Random(22)
+        for ply in range(60):
+            color = 'white' if ply % 2 == 0 else 'black'
+            moves = list(iter_legal_moves(board, color))
+            if not moves:
+                break
+            board = self.game.record_move(board, *rng.choice(moves))
+            other = 'black' if color == 'white' else 'white'
+            key = self.game._new_moves[-1].position_hash
+            self.assertEqual(key % (1 << 64), zobrist_hash(board, other))
+        self.assertLessEqual(
+            len(bytes(self.game.position_history)),
+            8 * (self.game.halfmove_clock + 1)
+        )
+
+    def test_fifty_move_rule(self):
+        board = self.start('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1')
+        board = self.game.record_move(board, 6, 4, 5, 4)    # clock resets
+        self.assertEqual(self.game.halfmove_clock, 0)
+        self.game.halfmove_clock = 99
+        board = self.game.record_move(board, 0, 4, 0, 3)
+        self.assertEqual(self.game.draw_reason(board), 'fifty-move rule')
+
+    def test_capture_down_to_insufficient_material(self):
+        board = self.start('4k3/8/8/8/8/8/3r4/4K1N1 w - - 0 1')
+        self.assertIsNone(self.game.draw_reason(board))
+        board = self.game.record_move(board, 7, 4, 6, 3)
+        self.assertEqual(self.game.draw_reason(board), 'insufficient material')
+
+
+class ActiveGameIndexTests(TestCase):
+    # A scaled-down seed; `manage.py active_game_plan --seed 1000000`
+    # shows the same plan on a production-sized table.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_games(10000, players=5)
+
+    def test_lookup_uses_partial_index(self):
+        plan = active_game_query(self.users[0]).explain()
+        self.assertIn('game_active_player_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan.upper())
+
+    def test_command_reports_plan(self):
+        out = StringIO()
+        call_command('active_game_plan', rounds=1, stdout=out)
+        self.assertIn('game_active_player_idx', out.getvalue())
+
+    def test_seeded_data_is_rolled_back(self):
+        users = get_user_model().objects.count()
+        games = GameSession.objects.count()
+        out = StringIO()
+        for _ in range(2):
+            call_command('active_game_plan', seed=50, players=5, rounds=1,
+                         stdout=out)
+        # The second run doesn't see the first one's games
+        self.assertEqual(out.getvalue().count(f'Games:  {games + 55}'), 2)
+        self.assertEqual(get_user_model().objects.count(), users)
+        self.assertEqual(GameSession.objects.count(), games)
+
+
+class BoardEncodingTests(TestCase):
+
+    def test_round_trip(self):
+        for board, _ in random_games(3, 80, seed=19):
+            packed = pack_board(board)
+            self.assertEqual(len(packed), PACKED_BOARD_SIZE)
+            self.assertEqual(unpack_board(packed), board)
+
+    def test_rejects_wrong_size(self):
+        with self.assertRaises(ValueError):
+            unpack_board(pack_board(init_board())[:-1])
+
+    def test_game_session_stores_packed_board(self):
+        user = get_user_model().objects.create_user(
+            username='packed', email='packed@example.com', password='pw123456'
+        )
+        board = apply_move(init_board(), 6, 4, 4, 4)
+        game = GameSession(player=user)
+        game.set_board(board)
+        game.save()
+        game = GameSession.objects.get(id=game.id)
+        self.assertEqual(len(bytes(game.board_data)), PACKED_BOARD_SIZE)
+        self.assertEqual(game.get_board(), board)
+        self.assertIsNone(GameSession(player=user).get_board())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('board_codec', rounds=10, stdout=out)
+        self.assertIn('packed', out.getvalue())
+
+
+# Published perft counts. These positions have no castling, en passant
+# captures or under-promotions within the listed depths, so they hold
+# for this rule set too.
+PERFT_POSITIONS = [
+    (START_FEN, [20, 400, 8902]),
+    ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191]),
+    ('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 '
+     'w - - 0 10', [46, 2079, 89890]),
+]
+
+
+class PerftTests(SimpleTestCase):
+
+    def test_known_positions(self):
+        for fen, counts in PERFT_POSITIONS:
+            pos = Position.from_fen(fen)
+            for depth, expected in enumerate(counts, start=1):
+                self.assertEqual(perft(pos, depth), expected, (fen, depth))
+            self.assertEqual(pos.to_fen().split()[:3], fen.split()[:3])
+
+    def test_board_perft_matches(self):
+        for fen, counts in PERFT_POSITIONS:
+            pos = Position.from_fen(fen)
+            board = pos.to_board()
+            self.assertEqual(board_perft(board, 2, pos.turn), counts[1])
+
+    def test_divide_sums_to_total(self):
+        pos = Position.from_fen(START_FEN)
+        counts = perft_divide(pos, 3)
+        self.assertEqual(len(counts), 20)
+        self.assertEqual(sum(counts.values()), 8902)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('perft', depth=2, stdout=out)
+        self.assertIn('Nodes:  400', out.getvalue())
+
+
+class EngineTests(SimpleTestCase):
+
+    def test_finds_mate_in_one(self):
+        # Black to move: Qh4 is mate (fool's mate)
+        board = Position.from_fen(
+            'rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq - 0 2'
+        ).to_board()
+        self.assertEqual(ai_move(board, depth=2), (0, 3, 4, 7))
+
+    def test_wins_hanging_queen(self):
+        board = Position.from_fen(
+            '4k3/8/8/3Q4/8/8/8/3rK3 b - - 0 1'
+        ).to_board()
+        self.assertEqual(ai_move(board, depth=2), (7, 3, 3, 3))
+
+    def test_move_is_legal(self):
+        for board, color in random_games(2, 30, seed=6):
+            if color != 'black':
+                continue
+            result = ai_move(board, depth=2)
+            self.assertIn(result, list(iter_legal_moves(board, 'black')))
+
+    def test_no_moves_returns_none(self):
+        # Black is stalemated
+        board = Position.from_fen('k7/2Q5/1K6/8/8/8/8/8 b - - 0 1').to_board()
+        self.assertIsNone(ai_move(board, depth=2))
+
+    def test_time_limit(self):
+        board = Position.from_fen(PERFT_POSITIONS[2][0]).to_board()
+        self.assertIsNotNone(ai_move(board, time_ms=50))
+
+
+class EvaluationTests(SimpleTestCase):
+
+    def test_colour_flipped_position_scores_the_same(self):
+        placement = PERFT_POSITIONS[1][0].split()[0]
+        flipped = '/'.join(reversed(placement.split('/'))).swapcase()
+        self.assertEqual(
+            evaluate(Position.from_fen(placement + ' w - - 0 1')),
+            evaluate(Position.from_fen(flipped + ' b - - 0 1'))
+        )
+
+    def test_incremental_totals_follow_push_and_pop(self):
+        rng = random.Random(13)
+        pos = Position.from_fen(START_FEN)
+        start = (pos.mg, pos.eg, pos.phase)
+        for _ in range(60):
+            moves = pos.legal_moves()
+            if not moves:
+                break
+            pos.push(rng.choice(moves))
+            self.assertEqual((pos.mg, pos.eg, pos.phase), full_totals(pos))
+        while pos._stack:
+            pos.pop()
+        self.assertEqual((pos.mg, pos.eg, pos.phase), start)
+
+    def test_endgame_tables_take_over_as_material_goes(self):
+        # Bare kings: only the endgame table counts, so a central king
+        # beats a king in the corner
+        centre = Position.from_fen('8/8/8/3k4/8/8/8/K7 w - - 0 1')
+        self.assertEqual(centre.phase, 0)
+        self.assertLess(evaluate(centre), 0)
+        self.assertEqual(evaluate(Position.from_fen(START_FEN)), 0)
+
+    @override_settings(CHESS_ENGINE={'EVAL_CHECK': True})
+    def test_search_with_eval_check(self):
+        pos = Position.from_fen(PERFT_POSITIONS[2][0])
+        Search(pos, tt=TranspositionTable(1)).iterate(2)
+
+
+class TranspositionTableTests(SimpleTestCase):
+
+    def test_store_and_probe(self):
+        tt = TranspositionTable(1)
+        tt.store(12345, 0x1234, 5, EXACT, -321)
+        self.assertEqual(tt.probe(12345), (0x1234, 5, EXACT, -321))
+        self.assertIsNone(tt.probe(54321))
+
+    def test_depth_preferred_slot_survives_shallow_store(self):
+        tt = TranspositionTable(1)
+        first = 7
+        second = first + tt.buckets     # same bucket, different key
+        third = first + 2 * tt.buckets
+        tt.store(first, 1, 8, EXACT, 10)
+        tt.store(second, 2, 1, LOWER, 20)
+        tt.store(third, 3, 1, UPPER, 30)
+        self.assertEqual(tt.probe(first)[0], 1)
+        self.assertIsNone(tt.probe(second))   # always-replace slot reused
+        self.assertEqual(tt.probe(third)[0], 3)
+
+    def test_old_generation_is_replaced(self):
+        tt = TranspositionTable(1)
+        tt.store(7, 1, 8, EXACT, 10)
+        tt.new_search()
+        tt.store(7 + tt.buckets, 2, 1, EXACT, 20)
+        self.assertIsNone(tt.probe(7))
+
+    @override_settings(CHESS_ENGINE={'TT_SIZE_MB': 1})
+    def test_size_from_settings(self):
+        tt = shared_table()
+        self.assertEqual(tt.size_mb, 1)
+        self.assertEqual(len(tt.keys), (1 << 20) // 16)
+        self.assertIs(shared_table(), tt)
+
+    def test_table_reused_between_searches(self):
+        tt = TranspositionTable(4)
+        fen = PERFT_POSITIONS[2][0]
+        first = Search(Position.from_fen(fen), tt=tt)
+        move, _ = first.iterate(3)
+        second = Search(Position.from_fen(fen), tt=tt)
+        self.assertEqual(second.iterate(3)[0], move)
+        self.assertLess(second.nodes, first.nodes)
+
+
+class BudgetTests(SimpleTestCase):
+
+    def test_node_limit(self):
+        searcher = Search(Position.from_fen(PERFT_POSITIONS[2][0]),
+                          tt=TranspositionTable(1), node_limit=500)
+        move, _ = searcher.iterate(10)
+        self.assertLessEqual(searcher.nodes, 500)
+        self.assertIn(move, Position.from_fen(PERFT_POSITIONS[2][0])
+                      .legal_moves())
+
+    def test_expired_deadline_still_returns_a_move(self):
+        board = Position.from_fen(PERFT_POSITIONS[2][0]).to_board()
+        result = ai_move(board, deadline=time.monotonic() - 1)
+        self.assertIn(result, list(iter_legal_moves(board, 'black')))
+
+    def test_position_restored_after_timeout(self):
+        pos = Position.from_fen(PERFT_POSITIONS[2][0])
+        fen = pos.to_fen()
+        Search(pos, tt=TranspositionTable(1), node_limit=300).iterate(10)
+        self.assertEqual(pos.to_fen(), fen)
+
+    @override_settings(CHESS_ENGINE={'DIFFICULTY': {
+        'medium': {'depth': 2, 'time_ms': None, 'nodes': None},
+    }})
+    def test_unknown_difficulty_falls_back_to_medium(self):
+        self.assertEqual(
+            difficulty_budget('nightmare'),
+            {'depth': 2, 'time_ms': None, 'nodes': None}
+        )
+
+
+class GameApiTestCase(TestCase):
+    """Creates a player with an API token and sends authenticated calls."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='player', email='player@example.com',
+            password='pw123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def api(self, method, url, data=None):
+        return getattr(self.client, method)(
+            url,
+            data=json.dumps(data) if data is not None else None,
+            content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+
+class DifficultyApiTests(GameApiTestCase):
+
+    def test_new_game_uses_requested_difficulty(self):
+        data = self.api('get', '/game/0/state/?difficulty=easy').json()
+        self.assertEqual(data['difficulty'], 'easy')
+        game = GameSession.objects.get(id=data['game_id'])
+        self.assertEqual(game.difficulty, 'easy')
+
+        response = self.api('post', f'/game/{game.id}/move/', {
+            'from_row': 6, 'from_col': 4, 'to_row': 4, 'to_col': 4,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['ai_move'])
+
+
+E4 = {'from_row': 6, 'from_col': 4, 'to_row': 4, 'to_col': 4}
+D4 = {'from_row': 6, 'from_col': 3, 'to_row': 4, 'to_col': 3}
+
+FAST_ENGINE = {
+    'DIFFICULTY': {'medium': {'depth': 1, 'time_ms': None, 'nodes': None}},
+}
+
+
+class LegalMovesApiTests(GameApiTestCase):
+
+    def test_map_only_when_asked_for(self):
+        self.assertNotIn(
+            'legal_moves', self.api('get', '/game/0/state/').json()
+        )
+
+    def test_state_lists_every_white_move(self):
+        data = self.api('get', '/game/0/state/?legal_moves=1').json()
+        moves = data['legal_moves']
+        self.assertEqual(sum(map(len, moves.values())), 20)
+        self.assertCountEqual(moves['6,4'], [[5, 4], [4, 4]])
+        self.assertNotIn('7,0', moves)
+
+    @override_settings(CHESS_ENGINE=FAST_ENGINE)
+    def test_move_response_matches_get_moves(self):
+        game_id = self.api('get', '/game/0/state/').json()['game_id']
+        data = self.api(
+            'post', f'/game/{game_id}/move/?legal_moves=1', E4
+        ).json()
+        expected = legal_move_map(data['board'], 'white')
+        self.assertEqual(
+            {key: sorted(map(tuple, targets))
+             for key, targets in data['legal_moves'].items()},
+            {f'{r},{c}': targets
+             for (r, c), targets in expected.items() if targets}
+        )
+        for key, targets in data['legal_moves'].items():
+            row, col = map(int, key.split(','))
+            response = self.api(
+                'post', f'/game/{game_id}/moves/', {'row': row, 'col': col}
+            )
+            self.assertCountEqual(response.json()['moves'], targets)
+
+
+class FenApiTests(GameApiTestCase):
+
+    def test_state_includes_fen(self):
+        data = self.api('get', '/game/0/state/').json()
+        self.assertEqual(data['fen'], START_FEN)
+
+    @override_settings(CHESS_ENGINE=FAST_ENGINE)
+    def test_create_game_from_fen(self):
+        old_id = self.api('get', '/game/0/state/').json()['game_id']
+        fen = '4k3/8/8/8/8/8/4P3/4K2R w K - 7 31'
+        response = self.api(
+            'post', '/game/fen/?difficulty=easy&legal_moves=1', {'fen': fen}
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['fen'], fen)
+        self.assertEqual(data['difficulty'], 'easy')
+        self.assertIn([4, 4], data['legal_moves']['6,4'])
+        self.assertEqual(GameSession.objects.get(id=old_id).status, 'draw')
+        game = GameSession.objects.get(id=data['game_id'])
+        self.assertEqual((game.halfmove_clock, game.fullmove_number), (7, 31))
+
+        # It's now the player's current game
+        state = self.api('get', '/game/0/state/').json()
+        self.assertEqual(state['game_id'], data['game_id'])
+        response = self.api('post', f"/game/{data['game_id']}/move/", {
+            'from_row': 6, 'from_col': 4, 'to_row': 4, 'to_col': 4,
+        })
+        self.assertEqual(response.status_code, 200)
+        # Black's reply finished move 31
+        game = GameSession.objects.get(id=data['game_id'])
+        self.assertEqual(game.fullmove_number, 32)
+
+    def test_capture_can_end_game_in_a_draw(self):
+        game_id = self.api('post', '/game/fen/', {
+            'fen': '4k3/8/8/8/8/8/3r4/4K1N1 w - - 0 1'
+        }).json()['game_id']
+        data = self.api('post', f'/game/{game_id}/move/', {
+            'from_row': 7, 'from_col': 4, 'to_row': 6, 'to_col': 3,
+        }).json()
+        self.assertEqual(data['status'], 'draw')
+        self.assertEqual(data['draw_reason'], 'insufficient material')
+        self.assertEqual(GameSession.objects.get(id=game_id).status, 'draw')
+
+    def test_finished_game_hashes_the_side_to_move(self):
+        game_id = self.api('post', '/game/fen/', {
+            'fen': '7k/8/6K1/8/8/8/8/1Q6 w - - 0 1'
+        }).json()['game_id']
+        self.api('post', f'/game/{game_id}/move/', {
+            'from_row': 7, 'from_col': 1, 'to_row': 0, 'to_col': 1,
+        })
+        game = GameSession.objects.get(id=game_id)
+        self.assertEqual(game.status, 'white_won')
+        self.assertEqual(
+            list(GameSession.with_position(game.get_board(), 'black')),
+            [game]
+        )
+        self.assertEqual(game.moves.get().position_hash, game.position_hash)
+
+    def test_rejects_unplayable_positions(self):
+        for fen in (
+            'not a fen',
+            '4k3/8/8/8/8/8/8/4K3 b - - 0 1',        # black to move
+            '8/8/8/8/8/8/8/4K3 w - - 0 1',          # no black king
+            '4k3/4R3/8/8/8/8/8/4K3 w - - 0 1',      # black in check
+            'K7/8/1q6/8/8/8/8/7k w - - 0 1',        # white stalemated
+            '4k3/8/8/8/8/8/4P3/4K2R w K - 100 80',  # fifty-move rule
+        ):
+            response = self.api('post', '/game/fen/', {'fen': fen})
+            self.assertEqual(response.status_code, 400, fen)
+        self.assertFalse(GameSession.objects.exists())
+
+
+@override_settings(CHESS_ENGINE=FAST_ENGINE)
+class ConcurrentMoveTests(TransactionTestCase):
+    """Parallel requests, each on its own thread and connection."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='racer', email='racer@example.com', password='pw123456'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def new_game(self, fen=START_FEN):
+        game = GameSession(player=self.user)
+        game.set_board(from_fen(fen)[0])
+        game.save()
+        return game
+
+    def post_all(self, requests):
+        """POST every (url, body) at once; the status codes, in order."""
+        barrier = threading.Barrier(len(requests))
+
+        def post(url, body):
+            try:
+                barrier.wait()
+                return Client().post(
+                    url, data=json.dumps(body),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Token {self.token.key}',
+                ).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(requests)) as pool:
+            return list(pool.map(lambda r: post(*r), requests))
+
+    def test_double_click_plays_one_move(self):
+        game = self.new_game()
+        codes = self.post_all([(f'/game/{game.id}/move/', E4)] * 4)
+        self.assertEqual(codes.count(200), 1, codes)
+        self.assertTrue(set(codes) <= {200, 400, 409}, codes)
+
+        game = GameSession.objects.get(id=game.id)
+        self.assertEqual(game.ply, 2)
+        self.assertEqual(game.turn, 'white')
+        self.assertEqual(game.moves.count(), 2)
+        self.assertEqual(game.board_at(2), game.get_board())
+
+    def test_parallel_wins_are_all_counted(self):
+        mate_in_one = '7k/8/6K1/8/8/8/8/Q7 w - - 0 1'
+        games = [self.new_game(mate_in_one) for _ in range(4)]
+        move = {'from_row': 7, 'from_col': 0, 'to_row': 0, 'to_col': 0}
+        codes = self.post_all(
+            [(f'/game/{game.id}/move/', move) for game in games]
+        )
+        self.assertEqual(codes, [200] * 4)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.games_played, 4)
+        self.assertEqual(self.user.games_won, 4)
+
+
+@override_settings(CHESS_ENGINE=FAST_ENGINE)
+class HistoryApiTests(GameApiTestCase):
+
+    def test_history_and_replay(self):
+        game_id = self.api('get', '/game/0/state/').json()['game_id']
+        reply = self.api('post', f'/game/{game_id}/move/', E4).json()
+
+        data = self.api('get', f'/game/{game_id}/history/?ply=1').json()
+        self.assertEqual(data['ply'], 2)
+        self.assertEqual(
+            data['moves'][0],
+            {'ply': 1, 'from': [6, 4], 'to': [4, 4], 'promotion': False}
+        )
+        self.assertEqual(data['moves'][1]['from'], reply['ai_move']['from'])
+        self.assertEqual(data['board'], apply_move(init_board(), 6, 4, 4, 4))
+
+        response = self.api('get', f'/game/{game_id}/history/?ply=3')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CHESS_ENGINE=FAST_ENGINE)
+class FailedSearchTests(GameApiTestCase):
+
+    def test_game_continues_when_search_raises(self):
+        game_id = self.api('get', '/game/0/state/').json()['game_id']
+        with mock.patch('game.ai_service.compute_ai_move',
+                        side_effect=RuntimeError('engine crashed')), \
+                self.assertLogs('game.ai_service', 'ERROR'):
+            response = self.api('post', f'/game/{game_id}/move/', E4)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['ai_move'])
+
+        game = GameSession.objects.get(id=game_id)
+        self.assertEqual(game.turn, 'white')
+        self.assertEqual(game.moves.count(), 2)
+        self.assertEqual(
+            self.api('post', f'/game/{game_id}/move/', D4).status_code, 200
+        )
+
+
+    def lose_reply(self, age):
+        """Play e4 as if the process searching the reply then died."""
+        game = GameSession.objects.get(
+            id=self.api('get', '/game/0/state/').json()['game_id']
+        )
+        board = game.record_move(game.get_board(), 6, 4, 4, 4)
+        game.turn = 'black'
+        game.set_board(board)
+        game.save()
+        GameSession.objects.filter(id=game.id).update(
+            updated_at=timezone.now() - age
+        )
+        return game.id
+
+    def test_state_finishes_a_lost_reply(self):
+        game_id = self.lose_reply(timedelta(minutes=5))
+        data = self.api('get', '/game/0/state/').json()
+        self.assertEqual((data['game_id'], data['turn']), (game_id, 'white'))
+        self.assertEqual(GameSession.objects.get(id=game_id).ply, 2)
+
+    def test_move_finishes_a_lost_reply(self):
+        game_id = self.lose_reply(timedelta(minutes=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api('post', f'/game/{game_id}/move/', D4)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            self.api('post', f'/game/{game_id}/move/', D4).status_code, 200
+        )
+
+    def test_reply_still_being_searched_is_left_alone(self):
+        game_id = self.lose_reply(timedelta(seconds=1))
+        data = self.api('get', '/game/0/state/').json()
+        self.assertEqual(data['turn'], 'black')
+        self.assertEqual(GameSession.objects.get(id=game_id).ply, 1)
+
+
+@override_settings(CHESS_ENGINE={**FAST_ENGINE, 'AI_MODE': 'queue'})
+class QueuedAiTests(GameApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.game_id = self.api('get', '/game/0/state/').json()['game_id']
+
+    def test_move_is_queued_then_played_by_worker(self):
+        response = self.api('post', f'/game/{self.game_id}/move/', E4)
+        self.assertEqual(response.status_code, 202)
+        data = response.json()
+        self.assertTrue(data['pending'])
+        self.assertEqual(data['poll_url'], f'/game/{self.game_id}/ai/')
+
+        # No second move until the AI has answered
+        second = self.api('post', f'/game/{self.game_id}/move/', D4)
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(self.api('get', data['poll_url']).status_code, 202)
+
+        call_command('engine_worker', once=True, stdout=StringIO())
+
+        reply = self.api('get', data['poll_url'])
+        self.assertEqual(reply.status_code, 200)
+        self.assertIsNotNone(reply.json()['ai_move'])
+        game = GameSession.objects.get(id=self.game_id)
+        self.assertEqual(game.turn, 'white')
+        self.assertEqual(game.moves.count(), 2)
+        self.assertEqual(game.get_board(), reply.json()['board'])
+        self.assertEqual(
+            self.api('post', f'/game/{self.game_id}/move/', D4).status_code,
+            202
+        )
+
+    def test_stale_job_is_dropped(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        GameSession.objects.filter(id=self.game_id).update(status='draw')
+        call_command('engine_worker', once=True, stdout=StringIO())
+        self.assertEqual(EngineJob.objects.get().status, 'failed')
+
+    def test_search_error_still_plays_a_reply(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        with mock.patch('game.ai_service.compute_ai_move',
+                        side_effect=RuntimeError('engine crashed')), \
+                self.assertLogs('game.ai_service', 'ERROR'):
+            call_command('engine_worker', once=True, stdout=StringIO())
+        self.assertEqual(EngineJob.objects.get().status, 'done')
+        self.assertEqual(GameSession.objects.get(id=self.game_id).turn, 'white')
+
+    def test_other_errors_are_retried(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        with mock.patch('game.ai_service.finish_ai_reply',
+                        side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('game.ai_service', 'ERROR'):
+            job = ai_service.run_job(ai_service.claim_job())
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+
+        job = ai_service.run_job(ai_service.claim_job())
+        self.assertEqual((job.status, job.attempts), ('done', 2))
+        self.assertEqual(GameSession.objects.get(id=self.game_id).turn, 'white')
+
+    def test_last_attempt_plays_the_fallback_move(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        finish = ai_service.finish_ai_reply
+        failures = [DatabaseError('disk I/O error')] * 3
+
+        def flaky_finish(*args):
+            if failures:
+                raise failures.pop()
+            return finish(*args)
+
+        with mock.patch('game.ai_service.finish_ai_reply', flaky_finish), \
+                self.assertLogs('game.ai_service', 'ERROR'):
+            call_command('engine_worker', once=True, stdout=StringIO())
+        job = EngineJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('done', 3))
+        game = GameSession.objects.get(id=self.game_id)
+        self.assertEqual((game.turn, game.ply), ('white', 2))
+
+    def test_fails_when_even_the_fallback_cannot_be_stored(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        with mock.patch('game.ai_service.finish_ai_reply',
+                        side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('game.ai_service', 'ERROR'):
+            call_command('engine_worker', once=True, stdout=StringIO())
+        job = EngineJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+
+    def test_job_whose_workers_keep_dying_is_answered_without_search(self):
+        self.api('post', f'/game/{self.game_id}/move/', E4)
+        # Three workers claimed it and were killed mid-search
+        EngineJob.objects.update(
+            status='running', attempts=3,
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+        with mock.patch('game.ai_service.compute_ai_move') as search:
+            call_command('engine_worker', once=True, stdout=StringIO())
+        search.assert_not_called()
+        job = EngineJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('done', 4))
+        self.assertEqual(GameSession.objects.get(id=self.game_id).turn, 'white')
+
+
+@override_settings(CHESS_ENGINE={
+    **FAST_ENGINE, 'AI_MODE': 'pool', 'AI_WORKERS': 1,
+})
+class PooledAiTests(GameApiTestCase):
+
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_reply_computed_in_pool(self):
+        game_id = self.api('get', '/game/0/state/').json()['game_id']
+        response = self.api('post', f'/game/{game_id}/move/', E4)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['ai_move'])
+
+
+@override_settings(CHESS_ENGINE={'SEARCH_WORKERS': 2, 'TT_SIZE_MB': 1})
+class ParallelSearchTests(SimpleTestCase):
+
+    def tearDown(self):
+        shutdown_pool()
+
+    def test_matches_serial_score_and_is_repeatable(self):
+        fen = PERFT_POSITIONS[2][0]
+        _, serial_score = Search(
+            Position.from_fen(fen), tt=TranspositionTable(1)
+        ).iterate(2)
+        first = parallel_search(Position.from_fen(fen), depth=2, seed=7)
+        second = parallel_search(Position.from_fen(fen), depth=2, seed=7)
+        self.assertEqual(first, second)
+        self.assertEqual(first[1], serial_score)
+
+    def test_ai_move_uses_workers(self):
+        board = Position.from_fen(
+            'rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq - 0 2'
+        ).to_board()
+        self.assertEqual(ai_move(board, depth=2, workers=2), (0, 3, 4, 7))
+
+    def test_pool_grows_to_the_requested_workers(self):
+        small = get_pool('search')
+        self.assertIs(get_pool('search', 2), small)
+        bigger = get_pool('search', 3)
+        self.assertIsNot(bigger, small)
+        self.assertIs(get_pool('search'), bigger)
+
+
+SAMPLE_PGN = """
+[Event "One"]
+[Result "1-0"]
+
+1. e4 e5 {open game} 2. Nf3 (2. Nc3 Nf6) Nc6 3. Bb5 a6 4. O-O Nf6 1-0
+
+[Event "Two"]
+[Result "0-1"]
+
+1. e4 c5 $1 2. Nf3 d6 0-1
+
+[Event "Three"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 Nf6 *
+"""
+
+
+class OpeningBookTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'book.bin')
+
+    def build(self):
+        games = list(read_pgn(SAMPLE_PGN.splitlines()))
+        write_book(self.path, book_counts(games, 16))
+        return OpeningBook(self.path)
+
+    def test_read_pgn_drops_comments_and_variations(self):
+        games = list(read_pgn(SAMPLE_PGN.splitlines()))
+        self.assertEqual(len(games), 3)
+        self.assertEqual(
+            games[0], ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6', 'O-O', 'Nf6']
+        )
+
+    def test_parse_san(self):
+        pos = Position.from_fen('4k3/8/8/8/8/8/4K3/R6R w - - 0 1')
+        self.assertIsNone(parse_san(pos, 'Rd1'))           # ambiguous
+        self.assertEqual(parse_san(pos, 'Rad1'), 56 | 59 << 6)
+        self.assertIsNone(parse_san(Position.from_fen(START_FEN), 'O-O'))
+
+    def test_lookup(self):
+        book = self.build()
+        start = Position.from_fen(START_FEN)
+        e4 = parse_san(start, 'e4')
+        self.assertEqual(book.entries(start.hash), [(e4, 3)])
+
+        start.push(e4)
+        replies = dict(book.entries(start.hash))
+        self.assertEqual(replies, {
+            parse_san(start, 'e5'): 2, parse_san(start, 'c5'): 1
+        })
+        self.assertEqual(book.entries(12345), [])
+
+    def test_book_stops_at_unsupported_move(self):
+        book = self.build()
+        pos = Position.from_fen(START_FEN)
+        for san in ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6']:
+            pos.push(parse_san(pos, san))
+        self.assertEqual(book.entries(pos.hash), [])     # O-O isn't played
+
+    def test_ai_move_plays_from_book(self):
+        self.build()
+        e4 = apply_move(init_board(), 6, 4, 4, 4)
+        d4 = apply_move(init_board(), 6, 3, 4, 3)
+        with override_settings(CHESS_ENGINE={'BOOK_PATH': self.path}):
+            # Book moves from the PGN, whatever the search budget
+            self.assertIn(ai_move(e4, nodes=1), [(1, 4, 3, 4), (1, 2, 3, 2)])
+            # Out of book: falls back to searching
+            self.assertIsNotNone(ai_move(d4, depth=1))
+
+    def test_command(self):
+        pgn = os.path.join(self.tmp.name, 'games.pgn')
+        with open(pgn, 'w') as f:
+            f.write(SAMPLE_PGN)
+        out = StringIO()
+        call_command(
+            'build_book', pgn, output=self.path, min_count=2, stdout=out
+        )
+        self.assertIn('Games:    3', out.getvalue())
+        # e4, e5 and Nf3 were played at least twice
+        self.assertEqual(len(OpeningBook(self.path)), 3)
+
+
+class TablebaseTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        out = StringIO()
+        # KPK needs KQK for its promotions, so both get built
+        call_command('build_tablebases', 'KPK', output_dir=cls.tmp.name,
+                     stdout=out)
+        cls.output = out.getvalue()
+        cls.tables = Tablebases(cls.tmp.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def test_command_builds_dependencies(self):
+        self.assertIn('KPK: wrote KQK, KPK', self.output)
+
+    def test_longest_queen_mate(self):
+        scores = self.tables.table('KQK').scores()
+        # KQK is won in at most 10 moves
+        self.assertEqual(TB_MATE - scores[scores > 0].min(), 19)
+
+    def test_probe_flips_colours(self):
+        white = Position.from_fen('k7/8/1K6/8/8/8/7Q/8 w - - 0 1')
+        black = Position.from_fen('K7/8/1k6/8/8/8/7q/8 b - - 0 1')
+        self.assertEqual(self.tables.probe_position(white), TB_MATE - 1)
+        self.assertEqual(self.tables.probe_position(black), TB_MATE - 1)
+
+    def test_scores_agree_with_best_move(self):
+        # Every entry is one ply better than the best of its children
+        rng = random.Random(15)
+        pieces = [('white', 'king'), ('white', 'pawn'), ('black', 'king')]
+        checked = 0
+        while checked < 100:
+            board = [[None] * 8 for _ in range(8)]
+            for sq, piece in zip(rng.sample(range(8, 56), 3), pieces):
+                board[sq // 8][sq % 8] = create_piece(*piece)
+            pos = Position.from_board(board, rng.choice(['white', 'black']))
+            if pos.is_in_check(pos.side ^ 1) or not pos.legal_moves():
+                continue
+            _, score = self.tables.best_move(pos)
+            self.assertEqual(score, self.tables.probe_position(pos))
+            checked += 1
+
+    def test_ai_move_mates_from_the_table(self):
+        board = Position.from_fen('K7/8/1k6/8/8/8/7q/8 b - - 0 1').to_board()
+        with override_settings(
+            CHESS_ENGINE={'TABLEBASE_DIR': self.tmp.name}
+        ):
+            self.assertEqual(ai_move(board, nodes=1), (6, 7, 0, 7))
+            # The search probes the tables as it reaches them
+            pos = Position.from_fen('3q4/8/5k2/8/8/8/8/3R3K b - - 0 1')
+            move, score = Search(pos, tt=TranspositionTable(1)).iterate(2)
+            self.assertEqual(move, parse_square('d8') | parse_square('d1') << 6)
+            self.assertGreater(score, MATE_BOUND)
+
+
+class MoveCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        move_cache.clear_move_cache()
+        self.addCleanup(move_cache.clear_move_cache)
+
+    def counting(self):
+        return mock.patch.object(
+            move_cache, '_game_outcome', wraps=move_cache._game_outcome
+        )
+
+    def test_matches_chess_logic(self):
+        for board, color in random_games(2, 30, seed=16):
+            self.assertEqual(
+                sorted(move_cache.legal_moves(board, color)),
+                sorted(iter_legal_moves(board, color))
+            )
+            for r in range(8):
+                for c in range(8):
+                    piece = board[r][c]
+                    if piece and piece['color'] == color:
+                        self.assertEqual(
+                            sorted(move_cache.piece_moves(board, r, c)),
+                            sorted(get_legal_moves(board, piece, r, c))
+                        )
+
+    def test_generated_once_per_position(self):
+        board = init_board()
+        with self.counting() as generate:
+            move_cache.piece_moves(board, 6, 4)
+            move_cache.piece_moves(board, 7, 6)
+            move_cache.game_outcome(board, 'white')
+            move_cache.move_map(board, 'white')
+            self.assertEqual(generate.call_count, 1)
+            move_cache.legal_moves(board, 'black')
+            self.assertEqual(generate.call_count, 2)
+
+    @override_settings(CHESS_ENGINE={'MOVE_CACHE_SIZE': 2})
+    def test_least_recently_used_is_evicted(self):
+        boards = [init_board(), apply_move(init_board(), 6, 4, 4, 4),
+                  apply_move(init_board(), 6, 3, 4, 3)]
+        with self.counting() as generate:
+            move_cache.legal_moves(boards[0], 'white')
+            move_cache.legal_moves(boards[1], 'white')
+            move_cache.legal_moves(boards[0], 'white')     # now most recent
+            move_cache.legal_moves(boards[2], 'white')     # evicts boards[1]
+            move_cache.legal_moves(boards[0], 'white')
+            self.assertEqual(generate.call_count, 3)
+            move_cache.legal_moves(boards[1], 'white')
+            self.assertEqual(generate.call_count, 4)
+
+    @override_settings(
+        CACHES={'moves': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'move-cache-tests',
+        }},
+        CHESS_ENGINE={'MOVE_CACHE_ALIAS': 'moves'},
+    )
+    def test_shared_cache_backend(self):
+        board = init_board()
+        first = move_cache.legal_moves(board, 'white')
+        # Another process starts with an empty local cache
+        move_cache.clear_move_cache()
+        with self.counting() as generate:
+            self.assertEqual(move_cache.legal_moves(board, 'white'), first)
+            self.assertEqual(generate.call_count, 0)
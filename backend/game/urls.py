@@ -6,7 +6,10 @@ app_name = 'game'
 urlpatterns = [
     path('',                    views.index,    name='index'),
     path('new/',                views.new_game, name='new_game'),
+    path('fen/',                views.game_from_fen, name='game_from_fen'),
     path('<int:game_id>/state/',    views.game_state, name='game_state'),
     path('<int:game_id>/moves/', views.get_moves, name='get_moves'),
     path('<int:game_id>/move/',  views.make_move, name='make_move'),
+    path('<int:game_id>/ai/',    views.ai_reply,  name='ai_reply'),
+    path('<int:game_id>/history/', views.game_history, name='game_history'),
 ]
\ No newline at end of file
@@ -1,15 +1,23 @@
 import json
+from django.db import transaction
+from django.db.models import F
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.authtoken.models import Token
+
+from accounts.token_auth import user_from_request
 
 from .models import GameSession
 from .chess_logic import (
-    init_board, get_legal_moves, apply_move,
-    ai_move, is_checkmate, is_stalemate, is_in_check
+    init_board, to_fen, parse_fen, is_in_check, insufficient_material
+)
+from .move_cache import piece_moves, move_map, game_outcome
+from .engine.config import engine_setting
+from .ai_service import (
+    play_ai_reply, enqueue_ai_reply, resume_stalled_reply, GameChanged
 )
 
 
@@ -17,17 +25,51 @@ from .chess_logic import (
 def get_user_from_token(request):
     """
     Reads Authorization: Token xxx header
-    Returns user or None
+    Returns user or None (cached, see accounts/token_auth.py)
     """
-    auth = request.META.get('HTTP_AUTHORIZATION', '')
-    if auth.startswith('Token '):
-        token_key = auth.split(' ')[1]
-        try:
-            token = Token.objects.get(key=token_key)
-            return token.user
-        except Token.DoesNotExist:
-            return None
-    return None
+    return user_from_request(request)
+
+
+# ── Helper: difficulty for a new game ────
+def requested_difficulty(request):
+    """
+    Reads ?difficulty= (or a POSTed field) and falls back to the
+    model default when it's missing or not a known level.
+    """
+    level = request.GET.get('difficulty') or request.POST.get('difficulty')
+    levels = dict(GameSession.DIFFICULTY_CHOICES)
+    if level in levels:
+        return level
+    return GameSession._meta.get_field('difficulty').default
+
+
+# ── Helper: optional legal-move map ──────
+def with_legal_moves(request, body, color='white'):
+    """
+    With ?legal_moves=1, adds every legal move of the side to move
+    to a response body, so the client can highlight moves without a
+    /moves/ call per piece. Finished games get an empty map.
+    """
+    if request.GET.get('legal_moves') in ('1', 'true'):
+        body['legal_moves'] = (
+            move_map(body['board'], color)
+            if body['status'] == 'active' else {}
+        )
+    return body
+
+
+# ── Helper: game_state response body ─────
+def state_body(game):
+    board = game.get_board()
+    return {
+        'game_id':    game.id,
+        'board':      board,
+        'fen':        to_fen(board, game.turn, game.halfmove_clock,
+                             game.fullmove_number),
+        'turn':       game.turn,
+        'status':     game.status,
+        'difficulty': game.difficulty,
+    }
 
 
 # ════════════════════════════════════════
@@ -46,8 +88,9 @@ def index(request):
         game.save()
 
     return render(request, 'game/index.html', {
-        'game': game,
-        'user': request.user,
+        'game':  game,
+        'board': game.get_board(),
+        'user':  request.user,
     })
 
 
@@ -61,7 +104,10 @@ def new_game(request):
         status='active'
     ).update(status='draw')
 
-    game = GameSession(player=request.user)
+    game = GameSession(
+        player=request.user,
+        difficulty=requested_difficulty(request)
+    )
     game.set_board(init_board())
     game.save()
     return redirect('game:index')
@@ -86,16 +132,18 @@ def game_state(request, game_id):
     ).order_by('-updated_at').first()
 
     if not game:
-        game = GameSession(player=user)
+        game = GameSession(
+            player=user,
+            difficulty=requested_difficulty(request)
+        )
         game.set_board(init_board())
         game.save()
+    else:
+        resume_stalled_reply(game)
 
-    return JsonResponse({
-        'game_id': game.id,
-        'board':   game.get_board(),
-        'turn':    game.turn,
-        'status':  game.status,
-    })
+    return JsonResponse(
+        with_legal_moves(request, state_body(game), game.turn)
+    )
 
 
 # ════════════════════════════════════════
@@ -130,7 +178,7 @@ def get_moves(request, game_id):
     if not piece or piece['color'] != 'white':
         return JsonResponse({'moves': []})
 
-    legal = get_legal_moves(board, piece, row, col)
+    legal = piece_moves(board, row, col)
     return JsonResponse({'moves': legal})
 
 
@@ -150,108 +198,267 @@ def make_move(request, game_id):
             status=401
         )
 
+    data     = json.loads(request.body)
+    from_row = data.get('from_row')
+    from_col = data.get('from_col')
+    to_row   = data.get('to_row')
+    to_col   = data.get('to_col')
+
+    with transaction.atomic():
+        # Lock the game: a second click waits here, then finds the move
+        # already made and the turn taken
+        game = get_object_or_404(
+            GameSession.objects.select_for_update(), id=game_id, player=user
+        )
+
+        if game.status != 'active':
+            return JsonResponse(
+                {'error': 'Game is already over'},
+                status=400
+            )
+
+        if game.turn != 'white':
+            # If the reply was lost with the process computing it, play
+            # it once this transaction lets go of the row
+            transaction.on_commit(lambda: resume_stalled_reply(game))
+            return JsonResponse(
+                {'error': 'AI is still thinking'},
+                status=409
+            )
+
+        board = game.get_board()
+        piece = board[from_row][from_col]
+
+        if not piece or piece['color'] != 'white':
+            return JsonResponse(
+                {'error': 'Not your piece'},
+                status=400
+            )
+
+        legal = piece_moves(board, from_row, from_col)
+        if (to_row, to_col) not in legal:
+            return JsonResponse(
+                {'error': 'Illegal move'},
+                status=400
+            )
+
+        # Apply player move
+        board = game.record_move(board, from_row, from_col, to_row, to_col)
+
+        # Black is to move in the new position, game over or not, and
+        # set_board() hashes it for the side in game.turn
+        game.turn = 'black'
+
+        # Checkmate or stalemate for black?
+        outcome, _ = game_outcome(board, 'black')
+
+        if outcome == 'checkmate':
+            game.set_board(board)
+            game.status = 'white_won'
+            game.save()
+            # Counted in the database, so parallel wins all add up
+            user.games_played = F('games_played') + 1
+            user.games_won    = F('games_won') + 1
+            user.save(update_fields=['games_played', 'games_won'])
+            return JsonResponse(with_legal_moves(request, {
+                'board':   board,
+                'status':  'white_won',
+                'ai_move': None,
+                'message': 'Checkmate! You won! 🏆'
+            }))
+
+        draw = 'stalemate' if outcome == 'stalemate' else \
+            game.draw_reason(board)
+
+        if draw:
+            game.set_board(board)
+            game.status = 'draw'
+            game.save()
+            return JsonResponse(with_legal_moves(request, {
+                'board':       board,
+                'status':      'draw',
+                'draw_reason': draw,
+                'ai_move':     None,
+                'message':     "Draw! 🤝"
+            }))
+
+        # AI reply — queued for an engine worker, or played now. Either
+        # way black's turn is saved before the lock is let go.
+        if engine_setting('AI_MODE') == 'queue':
+            job = enqueue_ai_reply(game, board)
+            return JsonResponse({
+                'board':    board,
+                'status':   'active',
+                'ai_move':  None,
+                'pending':  True,
+                'job_id':   job.id,
+                'poll_url': reverse('game:ai_reply', args=[game.id]),
+                'message':  'AI is thinking...'
+            }, status=202)
+
+        game.set_board(board)
+        game.save()
+
+    # The search runs outside the transaction; play_ai_reply() locks
+    # the game again to store the reply
+    try:
+        body = play_ai_reply(game, board)
+    except GameChanged as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    return JsonResponse(with_legal_moves(request, body))
+
+
+# ════════════════════════════════════════
+# 6. POLL FOR A QUEUED AI REPLY (Flutter)
+# ════════════════════════════════════════
+@csrf_exempt
+@require_http_methods(['GET', 'OPTIONS'])
+def ai_reply(request, game_id):
+    if request.method == 'OPTIONS':
+        return JsonResponse({}, status=200)
+
+    user = get_user_from_token(request)
+    if not user:
+        return JsonResponse(
+            {'error': 'Not authenticated'},
+            status=401
+        )
+
     game = get_object_or_404(
         GameSession, id=game_id, player=user
     )
 
-    if game.status != 'active':
+    job = game.engine_jobs.order_by('-id').first()
+    if not job:
         return JsonResponse(
-            {'error': 'Game is already over'},
-            status=400
+            {'error': 'No AI move requested'},
+            status=404
         )
 
-    data     = json.loads(request.body)
-    from_row = data.get('from_row')
-    from_col = data.get('from_col')
-    to_row   = data.get('to_row')
-    to_col   = data.get('to_col')
+    if job.status in ('pending', 'running'):
+        return JsonResponse(
+            {'pending': True, 'job_id': job.id},
+            status=202
+        )
 
-    board = game.get_board()
-    piece = board[from_row][from_col]
+    if job.status == 'failed':
+        return JsonResponse(job.get_result(), status=409)
 
-    if not piece or piece['color'] != 'white':
+    return JsonResponse(with_legal_moves(request, job.get_result()))
+
+
+# ════════════════════════════════════════
+# 7. NEW GAME FROM A FEN (Flutter)
+# ════════════════════════════════════════
+@csrf_exempt
+@require_http_methods(['POST', 'OPTIONS'])
+def game_from_fen(request):
+    if request.method == 'OPTIONS':
+        return JsonResponse({}, status=200)
+
+    user = get_user_from_token(request)
+    if not user:
+        return JsonResponse(
+            {'error': 'Not authenticated'},
+            status=401
+        )
+
+    data = json.loads(request.body)
+    try:
+        board, turn, _, halfmove, fullmove = parse_fen(data.get('fen') or '')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # The player is always white, so the game starts on their move
+    if turn != 'white':
         return JsonResponse(
-            {'error': 'Not your piece'},
+            {'error': 'White must be to move'},
             status=400
         )
 
-    legal = get_legal_moves(board, piece, from_row, from_col)
-    if (to_row, to_col) not in legal:
+    kings = [
+        p['color'] for row in board for p in row
+        if p and p['type'] == 'king'
+    ]
+    if sorted(kings) != ['black', 'white']:
         return JsonResponse(
-            {'error': 'Illegal move'},
+            {'error': 'Each side needs exactly one king'},
             status=400
         )
 
-    # Apply player move
-    board = apply_move(board, from_row, from_col, to_row, to_col)
+    if is_in_check(board, 'black'):
+        return JsonResponse(
+            {'error': 'Black is in check with white to move'},
+            status=400
+        )
 
-    # Check black checkmate
-    if is_checkmate(board, 'black'):
-        game.set_board(board)
-        game.status = 'white_won'
-        game.save()
-        user.games_played += 1
-        user.games_won    += 1
-        user.save()
-        return JsonResponse({
-            'board':   board,
-            'status':  'white_won',
-            'ai_move': None,
-            'message': 'Checkmate! You won! 🏆'
-        })
-
-    # Check black stalemate
-    if is_stalemate(board, 'black'):
-        game.set_board(board)
-        game.status = 'draw'
-        game.save()
-        return JsonResponse({
-            'board':   board,
-            'status':  'draw',
-            'ai_move': None,
-            'message': "Draw! 🤝"
-        })
-
-    # AI move
-    ai_result    = ai_move(board)
-    ai_move_data = None
-
-    if ai_result:
-        ar, ac, br, bc = ai_result
-        ai_move_data   = {'from': [ar, ac], 'to': [br, bc]}
-        board          = apply_move(board, ar, ac, br, bc)
-
-        if is_checkmate(board, 'white'):
-            game.set_board(board)
-            game.status = 'black_won'
-            game.save()
-            return JsonResponse({
-                'board':   board,
-                'status':  'black_won',
-                'ai_move': ai_move_data,
-                'message': 'Checkmate! You lost! 😔'
-            })
+    outcome, _ = game_outcome(board, 'white')
+    if outcome in ('checkmate', 'stalemate') or halfmove >= 100 or \
+       insufficient_material(board):
+        return JsonResponse(
+            {'error': 'Game is already over'},
+            status=400
+        )
 
-        if is_stalemate(board, 'white'):
-            game.set_board(board)
-            game.status = 'draw'
-            game.save()
-            return JsonResponse({
-                'board':   board,
-                'status':  'draw',
-                'ai_move': ai_move_data,
-                'message': "Draw! 🤝"
-            })
+    GameSession.objects.filter(
+        player=user,
+        status='active'
+    ).update(status='draw')
 
+    game = GameSession(
+        player=user,
+        difficulty=requested_difficulty(request),
+        halfmove_clock=halfmove,
+        fullmove_number=fullmove,
+    )
     game.set_board(board)
     game.save()
 
-    in_check = is_in_check(board, 'white')
+    return JsonResponse(
+        with_legal_moves(request, state_body(game)),
+        status=201
+    )
+
+
+# ════════════════════════════════════════
+# 8. MOVE HISTORY / REPLAY (Flutter)
+# ════════════════════════════════════════
+@csrf_exempt
+@require_http_methods(['GET', 'OPTIONS'])
+def game_history(request, game_id):
+    if request.method == 'OPTIONS':
+        return JsonResponse({}, status=200)
+
+    user = get_user_from_token(request)
+    if not user:
+        return JsonResponse(
+            {'error': 'Not authenticated'},
+            status=401
+        )
+
+    game = get_object_or_404(
+        GameSession, id=game_id, player=user
+    )
+
+    body = {
+        'game_id': game.id,
+        'ply':     game.ply,
+        'moves': [
+            {
+                'ply':       move.ply,
+                'from':      list(move.from_square),
+                'to':        list(move.to_square),
+                'promotion': move.promotion,
+            }
+            for move in game.moves.order_by('ply').only('ply', 'code')
+        ],
+    }
+
+    # ?ply=N also returns the board after N moves
+    if 'ply' in request.GET:
+        try:
+            body['board'] = game.board_at(int(request.GET['ply']))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
 
-    return JsonResponse({
-        'board':    board,
-        'status':   'active',
-        'ai_move':  ai_move_data,
-        'in_check': in_check,
-        'message':  '⚠️ Check!' if in_check else 'Your turn'
-    })
\ No newline at end of file
+    return JsonResponse(body)
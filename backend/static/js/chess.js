@@ -258,6 +258,17 @@ async function selectPiece(row, col) {
 }
 
 
+async function pollAiReply(url) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 300));
+        const res = await fetch(url, {
+            headers: { 'X-CSRFToken': CSRF_TOKEN },
+        });
+        if (res.status !== 202) return res.json();
+    }
+}
+
+
 async function playerMove(fromRow, fromCol, toRow, toCol) {
     isThinking = true;
     setStatus('🤔', 'AI is thinking...', '');
@@ -292,7 +303,12 @@ async function playerMove(fromRow, fromCol, toRow, toCol) {
             }),
         });
 
-        const data = await res.json();
+        let data = await res.json();
+
+        // AI reply queued on the server → poll until it's ready
+        if (res.status === 202 && data.poll_url) {
+            data = await pollAiReply(data.poll_url);
+        }
 
         if (data.error) {
             setStatus('❌', data.error, '');